@@ -0,0 +1,193 @@
+"""
+Реестр индексов MongoDB.
+
+Все индексы, на которые опираются запросы приложения, описаны здесь и
+сверяются при старте (ensure_indexes): недостающие создаются, индексы
+с тем же именем, но другим описанием пересоздаются, устаревшие удаляются.
+Чужие индексы, не упомянутые в реестре, не трогаются.
+
+Проверка планов запросов:
+    python -m app.indexes --check
+прогоняет запросы роутеров через explain() и завершается с ошибкой,
+если хоть один из них выполняется полным сканированием (COLLSCAN).
+"""
+
+import asyncio
+import sys
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.database import db
+from app.services.ai_cache import AI_CACHE_COLLECTION, AI_CACHE_TTL
+
+INDEXES = {
+    "schedules": [
+        IndexModel([("group_name", ASCENDING)], name="group_name_1", unique=True),
+    ],
+    "users": [
+        # один и тот же user_id может быть в разных платформах
+        IndexModel(
+            [("platform", ASCENDING), ("user_id", ASCENDING)],
+            name="platform_user_id",
+            unique=True,
+        ),
+        # _id в конце — курсорная пагинация без сортировки в памяти
+        IndexModel([("platform", ASCENDING), ("_id", ASCENDING)], name="platform_id"),
+        IndexModel(
+            [("platform", ASCENDING), ("group_name", ASCENDING), ("_id", ASCENDING)],
+            name="platform_group_name",
+        ),
+        # рассылка: только подписанные пользователи
+        IndexModel(
+            [("platform", ASCENDING), ("schedule_time", ASCENDING), ("_id", ASCENDING)],
+            name="subscriptions",
+            partialFilterExpression={"schedule_enabled": True},
+        ),
+    ],
+    AI_CACHE_COLLECTION: [
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=AI_CACHE_TTL,
+        ),
+    ],
+    "teacher_lessons": [
+        IndexModel(
+            [("teacher_key", ASCENDING), ("day_key", ASCENDING)],
+            name="teacher_key_1_day_key_1",
+        ),
+        IndexModel(
+            [
+                ("teacher_key", ASCENDING),
+                ("day_index", ASCENDING),
+                ("order", ASCENDING),
+                ("seq", ASCENDING),
+            ],
+            name="teacher_key_1_day_index_1_order_1_seq_1",
+        ),
+        IndexModel([("group_name", ASCENDING)], name="group_name_1"),
+    ],
+}
+
+# индексы, которые больше не нужны (или мешают)
+OBSOLETE_INDEXES = {
+    # уникальность user_id без платформы
+    "users": ["user_id_1"],
+}
+
+_ID_SORT = [("_id", 1)]
+
+# запросы роутеров: (коллекция, фильтр, сортировка)
+QUERY_PLANS = [
+    ("schedules", {"group_name": "ИС-1"}, None),
+    ("users", {"platform": "telegram", "user_id": 1}, None),
+    ("users", {"platform": "telegram"}, _ID_SORT),
+    ("users", {"platform": "telegram", "group_name": "ИС-1"}, _ID_SORT),
+    (
+        "users",
+        {"platform": "telegram", "schedule_enabled": True, "schedule_time": "08:00"},
+        _ID_SORT,
+    ),
+    (
+        "teacher_lessons",
+        {"teacher_key": {"$in": ["ивановии"]}, "day_key": "понедельник"},
+        [("day_index", 1), ("order", 1), ("seq", 1)],
+    ),
+    (
+        "teacher_lessons",
+        {"teacher_key": {"$in": ["ивановии"]}},
+        [("day_index", 1), ("order", 1), ("seq", 1)],
+    ),
+    ("teacher_lessons", {"group_name": "ИС-1"}, None),
+]
+
+# параметры индекса, которые сравниваются с существующим
+_INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _same_index(existing: dict, model: IndexModel) -> bool:
+    spec = model.document
+    if list(existing["key"]) != list(spec["key"].items()):
+        return False
+    return all(existing.get(opt) == spec.get(opt) for opt in _INDEX_OPTIONS)
+
+
+async def create_collection_indexes(collection, name: str | None = None):
+    """Создаёт индексы реестра на коллекции (в т.ч. промежуточной: name — имя в реестре)"""
+    models = INDEXES.get(name or collection.name)
+    if models:
+        await collection.create_indexes(models)
+
+
+async def ensure_indexes() -> dict:
+    """Сверяет индексы всех коллекций с реестром. Возвращает выполненные действия."""
+    report = {"created": [], "recreated": [], "dropped": [], "failed": []}
+    for name in sorted(set(INDEXES) | set(OBSOLETE_INDEXES)):
+        collection = db[name]
+        existing = await collection.index_information()
+
+        for index_name in OBSOLETE_INDEXES.get(name, []):
+            if index_name in existing:
+                await collection.drop_index(index_name)
+                report["dropped"].append(f"{name}.{index_name}")
+
+        for model in INDEXES.get(name, []):
+            index_name = model.document["name"]
+            current = existing.get(index_name)
+            if current is not None and _same_index(current, model):
+                continue
+            try:
+                if current is not None:
+                    await collection.drop_index(index_name)
+                await collection.create_indexes([model])
+            except OperationFailure as e:
+                # например, дубликаты мешают уникальному индексу — не валим старт
+                print(f"❌ Индекс {name}.{index_name} не создан: {e}")
+                report["failed"].append(f"{name}.{index_name}")
+                continue
+            key = "recreated" if current is not None else "created"
+            report[key].append(f"{name}.{index_name}")
+
+    for action, names in report.items():
+        if names:
+            print(f"🗂 Индексы ({action}): {', '.join(names)}")
+    return report
+
+
+def _plan_stages(plan) -> list[str]:
+    """Все стадии плана explain() (включая вложенные)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def check_query_plans() -> list[str]:
+    """Запросы из QUERY_PLANS, которые выполняются через COLLSCAN"""
+    failures = []
+    for name, query, sort in QUERY_PLANS:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{status:8} {name} {query} sort={sort} -> {' > '.join(stages)}")
+        if status == "COLLSCAN":
+            failures.append(f"{name} {query}")
+    return failures
+
+
+if __name__ == "__main__":
+
+    async def _main():
+        await ensure_indexes()
+        if "--check" in sys.argv and await check_query_plans():
+            sys.exit(1)
+
+    asyncio.run(_main())
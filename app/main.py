@@ -3,6 +3,16 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.routers import bell_schedule, users, schedule, ai
 from app.database import db
+from app.indexes import ensure_indexes
+from app.services.ai_service import close_ai_client
+from app.services.ai_warmup import cancel_warmup
+from app.services.bell_times import import_legacy_bell_files
+from app.services.schedule_cache import bump_schedule_generation
+from app.services.schedule_parser import shutdown_parser_pool
+from app.services.schedule_store import migrate_schedules_to_canonical
+from app.services.teacher_index import rebuild_teacher_index
+from app.services.user_stats import ensure_user_stats
+from app.utils.pagination import NEXT_CURSOR_HEADER
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
@@ -16,13 +26,22 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting up...")
 
-    # создаём индексы Mongo
-    await db.schedules.create_index("group_name", unique=True)
-    await db.users.create_index("user_id", unique=True)
+    # сверяем индексы Mongo с реестром (app/indexes.py)
+    await ensure_indexes()
+
+    # расписания старого формата переводим в канонический
+    if await migrate_schedules_to_canonical():
+        await rebuild_teacher_index()
+        await bump_schedule_generation()
+    await import_legacy_bell_files()
+    await ensure_user_stats()
 
     yield
 
     logger.info("🛑 Shutting down...")
+    shutdown_parser_pool()
+    await cancel_warmup(generations=True)
+    await close_ai_client()
     db.client.close()
 
 
@@ -34,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
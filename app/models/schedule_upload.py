@@ -1,9 +1,20 @@
 from pydantic import BaseModel
 from typing import List
 
+class ParserCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    hit_rate: float = 0.0
+    merged_cells: int = 0
+
 class UploadResponse(BaseModel):
     message: str
     inserted_ids: List[str]
     total_groups: int
     first_shift: int
     second_shift: int
+    added: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    parser_cache: ParserCacheStats = ParserCacheStats()
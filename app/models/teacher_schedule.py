@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class TeacherLesson(BaseModel):
     subject: str
@@ -15,3 +15,13 @@ class TeacherScheduleResponse(BaseModel):
     teacher_fio: str
     filtered_by_day: Optional[str] = None
     schedule: TeacherShiftSchedule
+
+class TeacherCandidate(BaseModel):
+    key: str
+    name: str
+    lessons: int
+    score: float
+
+class TeacherSearchResponse(BaseModel):
+    query: str
+    candidates: List[TeacherCandidate]
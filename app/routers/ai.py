@@ -1,12 +1,34 @@
-from fastapi import APIRouter, Depends, Query
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.schemas.reasoning_schema import ReasoningRequest, ReasoningResponse
-from app.services.ai_service import AIService
+from app.services.ai_cache import ai_cache
+from app.services.ai_service import AIService, ai_available
+from app.services.ai_warmup import (
+    cancel_warmup,
+    get_warmup_progress,
+    note_teacher_request,
+    start_warmup,
+)
 from app.services.schedule_service import ScheduleService
 
 router = APIRouter()
 
 
+# прокси (nginx) не должны копить поток событий
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def require_ai():
+    if not ai_available():
+        raise HTTPException(
+            status_code=503, detail="AI недоступен: не задан OPENROUTER_API_KEY"
+        )
+
+
 def get_ai_service():
+    # клиент внутри общий на процесс, сервис — тонкая обёртка
+    require_ai()
     return AIService()
 
 
@@ -16,13 +38,59 @@ async def reasoning_endpoint(
     service: AIService = Depends(get_ai_service),
 ):
 
-    answer = service.ask(
+    answer = await service.ask(
         user_message=request.user_message, system_message=request.system_message
     )
 
     return ReasoningResponse(answer=answer)
 
 
+@router.get("/cache/stats", summary="Статистика кэша AI-описаний")
+async def get_ai_cache_stats():
+    return ai_cache.stats()
+
+
+async def _sse(events):
+    """События (тип, данные) в формате text/event-stream"""
+    try:
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        # заголовки уже отправлены — сообщаем об ошибке событием
+        print(f"❌ Ошибка потоковой генерации описания: {e}")
+        data = json.dumps({"detail": "Ошибка генерации описания"}, ensure_ascii=False)
+        yield f"event: error\ndata: {data}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        _sse(events), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+@router.get("/warmup", summary="Ход прогрева кэша AI-описаний")
+async def get_ai_warmup_progress():
+    return get_warmup_progress()
+
+
+@router.post("/warmup", summary="Запустить прогрев кэша AI-описаний")
+async def start_ai_warmup():
+    require_ai()
+    job = start_warmup("manual")
+    if job is None:
+        raise HTTPException(
+            status_code=409, detail="Прогрев выключен (AI_WARMUP_ENABLED)"
+        )
+    return job.progress()
+
+
+@router.delete("/warmup", summary="Остановить прогрев кэша AI-описаний")
+async def cancel_ai_warmup():
+    if not await cancel_warmup():
+        raise HTTPException(status_code=404, detail="Прогрев не выполняется")
+    return get_warmup_progress()
+
+
 @router.get("/schedule/{group_name}", summary="AI описание расписания группы")
 async def get_ai_schedule_description(
     group_name: str,
@@ -45,9 +113,46 @@ async def get_ai_teacher_schedule_description(
 ):
 
     schedule = await ScheduleService.get_teacher_schedule(fio, day)
+    teacher_keys = await ScheduleService.resolve_teacher_keys(fio)
+    note_teacher_request(teacher_keys)
 
     ai_text = await ai_service.describe_teacher_schedule(
-        schedule=schedule, fio=fio, day=day
+        schedule=schedule, fio=fio, day=day, teacher_keys=teacher_keys
     )
 
     return {"teacher": fio, "day": day, "description": ai_text}
+
+
+@router.get(
+    "/schedule/{group_name}/stream",
+    summary="AI описание расписания группы (server-sent events)",
+)
+async def stream_ai_schedule_description(
+    group_name: str,
+    day: str | None = Query(None),
+    ai_service: AIService = Depends(get_ai_service),
+):
+    # 404 — до начала потока, обычным ответом
+    schedule = await ScheduleService.get_schedule_by_group(group_name, day)
+
+    return _sse_response(ai_service.describe_schedule_stream(schedule, day))
+
+
+@router.get(
+    "/teacher/{fio}/stream",
+    summary="AI описание расписания преподавателя (server-sent events)",
+)
+async def stream_ai_teacher_schedule_description(
+    fio: str,
+    day: str | None = Query(None),
+    ai_service: AIService = Depends(get_ai_service),
+):
+    schedule = await ScheduleService.get_teacher_schedule(fio, day)
+    teacher_keys = await ScheduleService.resolve_teacher_keys(fio)
+    note_teacher_request(teacher_keys)
+
+    return _sse_response(
+        ai_service.describe_teacher_schedule_stream(
+            schedule=schedule, fio=fio, day=day, teacher_keys=teacher_keys
+        )
+    )
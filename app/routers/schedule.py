@@ -1,9 +1,11 @@
 from typing import List
-from fastapi import APIRouter, Query, UploadFile, File
+from fastapi import APIRouter, Query, Request, Response, UploadFile, File
 from app.models.schedule import Schedule
 from app.models.schedule_upload import UploadResponse
-from app.models.teacher_schedule import TeacherScheduleResponse
+from app.models.teacher_schedule import TeacherScheduleResponse, TeacherSearchResponse
+from app.services.ai_warmup import start_warmup
 from app.services.schedule_service import ScheduleService
+from app.utils.http_cache import is_not_modified, not_modified_response, set_validators
 
 router = APIRouter()
 
@@ -18,10 +20,47 @@ router = APIRouter()
     ),
     response_description="Список всех групп с их расписанием."
 )
-async def get_all_schedules():
+async def get_all_schedules(request: Request, response: Response):
+    etag, last_modified = await ScheduleService.get_generation_validators("all")
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    set_validators(response, etag, last_modified)
     return await ScheduleService.get_all_schedules()
 
 
+# 📊 Статистика кэша расписаний
+@router.get(
+    "/cache/stats",
+    summary="Статистика кэша расписаний",
+    description=(
+        "Попадания и промахи кэша расписаний групп в этом процессе, "
+        "текущее поколение расписания, объём и вытеснения."
+    ),
+    response_description="Счётчики кэша расписаний."
+)
+async def get_schedule_cache_stats():
+    return ScheduleService.get_cache_stats()
+
+
+# 🔎 Поиск преподавателя (автодополнение)
+@router.get(
+    "/teachers/search",
+    response_model=TeacherSearchResponse,
+    summary="Найти преподавателя по части ФИО",
+    description=(
+        "Ранжированные кандидаты по началу фамилии и нечёткому совпадению. "
+        "`key` кандидата можно передать в расписание преподавателя."
+    ),
+    response_description="Кандидаты по убыванию score."
+)
+async def search_teachers(
+    q: str = Query(..., min_length=1, description="Начало фамилии или ФИО"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    candidates = await ScheduleService.search_teachers(q, limit)
+    return {"query": q, "candidates": candidates}
+
+
 # 📅 Расписание конкретной группы
 @router.get(
     "/{group_name}",
@@ -29,18 +68,28 @@ async def get_all_schedules():
     summary="Получить расписание группы",
     description=(
         "Возвращает полное расписание группы. "
-        "Можно указать параметр `day`, чтобы получить расписание только на один день."
+        "Можно указать параметр `day`, чтобы получить расписание только на один день. "
+        "Поддерживает `If-None-Match` / `If-Modified-Since` (ответ 304)."
     ),
     response_description="Расписание группы или расписание за указанный день."
 )
 async def get_schedule(
+    request: Request,
+    response: Response,
     group_name: str,
     day: str | None = Query(
         None,
         description="Необязательно: день недели (например, 'Понедельник', 'Вт', 'Mon')."
     )
 ):
-    return await ScheduleService.get_schedule_by_group(group_name, day)
+    # снимок берётся один раз: и для валидаторов, и для тела ответа
+    snapshot = await ScheduleService.resolve_group_snapshot(group_name, day)
+    validators = ScheduleService.group_validators(snapshot, day)
+    if validators:
+        if is_not_modified(request, *validators):
+            return not_modified_response(*validators)
+        set_validators(response, *validators)
+    return ScheduleService.group_schedule_from_snapshot(group_name, day, snapshot)
 
 
 # 📤 Загрузка нового DOCX расписания
@@ -51,7 +100,8 @@ async def get_schedule(
     description=(
         "Принимает DOCX-файл с расписанием и сохраняет его в базу данных. "
         "Опционально можно прикрепить JSON-файл со сменами (`group_shifts.json`). "
-        "Перед загрузкой старое расписание полностью очищается."
+        "Перезаписываются только изменившиеся группы, "
+        "предыдущая версия сохраняется для отката."
     ),
     response_description="Информация о загруженных расписаниях и количестве групп."
 )
@@ -65,7 +115,26 @@ async def upload_schedule(
         description="Необязательно: JSON-файл со сменами и кабинетами."
     )
 ):
-    return await ScheduleService.upload_schedule(schedule_file, shifts_file)
+    result = await ScheduleService.upload_schedule(schedule_file, shifts_file)
+    # AI-описания нового расписания — в фоне (если включено)
+    start_warmup("upload")
+    return result
+
+
+# ↩️ Откат к предыдущему расписанию
+@router.post(
+    "/rollback",
+    summary="Откатить расписание к предыдущей загрузке",
+    description=(
+        "Меняет местами текущее расписание и расписание предыдущей загрузки. "
+        "Повторный вызов возвращает текущее обратно."
+    ),
+    response_description="Сообщение об успешном откате."
+)
+async def rollback_schedule():
+    result = await ScheduleService.rollback_schedule()
+    start_warmup("rollback")
+    return result
 
 
 # ❌ Удаление расписания
@@ -86,15 +155,28 @@ async def delete_schedule(group_name: str):
     summary="Получить расписание преподавателя",
     description=(
         "Возвращает расписание для указанного преподавателя. "
-        "Можно указать параметр `day`, чтобы получить только занятия на выбранный день."
+        "Можно указать параметр `day`, чтобы получить только занятия на выбранный день. "
+        "С параметром `key` (из /schedule/teachers/search) ФИО не сопоставляется."
     ),
     response_description="Расписание преподавателя по дням и сменам."
 )
 async def get_teacher_schedule(
+    request: Request,
+    response: Response,
     fio: str,
     day: str | None = Query(
         None,
         description="Необязательно: день недели (например, 'Понедельник', 'Вт', 'Mon')."
+    ),
+    key: str | None = Query(
+        None,
+        description="Необязательно: ключ преподавателя из /schedule/teachers/search."
     )
 ):
-    return await ScheduleService.get_teacher_schedule(fio, day)
+    etag, last_modified = await ScheduleService.get_generation_validators(
+        "teacher", fio.strip(), day, key
+    )
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    return await ScheduleService.get_teacher_schedule(fio, day, key)
@@ -1,13 +1,36 @@
-from fastapi import APIRouter, Body, HTTPException, Query
+from datetime import date as date_type
+from decouple import config
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
 from app.database import db
 from app.models.user import User, UserStats
+from app.services.dispatch_service import iter_dispatch_records
+from app.services.user_import import BULK_BATCH_SIZE, bulk_upsert_users
+from app.services.user_stats import (
+    COUNTER_FIELDS,
+    add_user_change,
+    get_platform_stats,
+    reconcile_user_stats,
+    user_changes,
+)
+from app.utils.pagination import fetch_page, iter_ndjson
 
 router = APIRouter()
 
+STREAM_BATCH_SIZE = config("USERS_STREAM_BATCH_SIZE", default=1000, cast=int)
+# попытки обновления, если счётчиковые поля меняет параллельный запрос
+USER_UPDATE_ATTEMPTS = 3
+
+CURSOR_DESCRIPTION = "Курсор следующей страницы из заголовка X-Next-Cursor"
+SKIP_DESCRIPTION = "Устарело: используйте cursor"
+
 
 @router.get("/", response_model=list[User])
 async def get_users(
-    skip: int = Query(0, ge=0, description="Количество пропущенных записей"),
+    response: Response,
+    cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+    skip: int = Query(0, ge=0, deprecated=True, description=SKIP_DESCRIPTION),
     limit: int = Query(
         100,
         gt=0,
@@ -15,88 +38,80 @@ async def get_users(
         description="Количество записей для получения (по умолчанию 100, максимум 1000)",
     ),
 ):
-    users = await db.users.find().skip(skip).limit(limit).to_list(length=limit)
-    return users
+    return await fetch_page(db.users, {}, limit, cursor, response, skip)
+
+
+@router.get("/stream")
+async def stream_users(
+    platform: str | None = Query(None),
+    group_name: str | None = Query(None),
+    schedule_time: str | None = Query(
+        None, description="Только подписчики рассылки на это время"
+    ),
+):
+    """
+    Все пользователи (с фильтрами) в NDJSON. Документы читаются
+    из MongoDB пачками, список целиком в памяти не собирается.
+    """
+    query = {}
+    if platform:
+        query["platform"] = platform
+    if group_name:
+        query["group_name"] = group_name
+    if schedule_time:
+        query["schedule_enabled"] = True
+        query["schedule_time"] = schedule_time
+
+    cursor = db.users.find(query).sort("_id", 1).batch_size(STREAM_BATCH_SIZE)
+    return StreamingResponse(
+        iter_ndjson(cursor, User), media_type="application/x-ndjson"
+    )
 
 
 @router.get("/platform/{platform}", response_model=list[User])
 async def get_users_by_platform(
     platform: str,
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+    skip: int = Query(0, ge=0, deprecated=True, description=SKIP_DESCRIPTION),
     limit: int = Query(100, gt=0, le=1000),
 ):
-    users = (
-        await db.users.find({"platform": platform})
-        .skip(skip)
-        .limit(limit)
-        .to_list(length=limit)
+    return await fetch_page(
+        db.users, {"platform": platform}, limit, cursor, response, skip
     )
-    return users
 
 
 @router.get("/group/{platform}/{group_name}", response_model=list[User])
-async def get_users_by_group(platform: str, group_name: str):
-
-    users = await db.users.find(
+async def get_users_by_group(
+    platform: str,
+    group_name: str,
+    response: Response,
+    cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+    limit: int = Query(10000, gt=0, le=10000),
+):
+    return await fetch_page(
+        db.users,
         {
             "platform": platform,
             "group_name": group_name,
-        }
-    ).to_list(length=10000)
-
-    return users
+        },
+        limit,
+        cursor,
+        response,
+    )
 
 
 @router.get("/stats/{platform}", response_model=UserStats)
 async def get_user_stats(platform: str):
+    # счётчики поддерживаются при изменении пользователей — одно чтение
+    return await get_platform_stats(platform)
 
-    pipeline = [
-        {"$match": {"platform": platform}},
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": 1},
-                "students": {"$sum": {"$cond": [{"$eq": ["$role", "student"]}, 1, 0]}},
-                "teachers": {"$sum": {"$cond": [{"$eq": ["$role", "teacher"]}, 1, 0]}},
-                "admins": {"$sum": {"$cond": [{"$eq": ["$role", "admin"]}, 1, 0]}},
-                "subscriptions": {"$sum": {"$cond": ["$schedule_enabled", 1, 0]}},
-                "groups": {"$addToSet": "$group_name"},
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "total": 1,
-                "students": 1,
-                "teachers": 1,
-                "admins": 1,
-                "subscriptions": 1,
-                "groups": {
-                    "$size": {
-                        "$filter": {
-                            "input": "$groups",
-                            "as": "g",
-                            "cond": {"$ne": ["$$g", None]},
-                        }
-                    }
-                },
-            }
-        },
-    ]
-
-    result = await db.users.aggregate(pipeline).to_list(length=1)
 
-    if not result:
-        return {
-            "total": 0,
-            "students": 0,
-            "teachers": 0,
-            "admins": 0,
-            "groups": 0,
-            "subscriptions": 0,
-        }
-
-    return result[0]
+@router.post("/stats/reconcile")
+async def reconcile_stats(platform: str | None = Query(None)):
+    """Пересчитывает счётчики с нуля и возвращает найденные расхождения"""
+    drift = await reconcile_user_stats(platform)
+    return {"drift": drift, "platforms_with_drift": len(drift)}
 
 
 @router.get("/{platform}/{user_id}", response_model=User)
@@ -112,16 +127,35 @@ async def get_user(platform: str, user_id: int):
 # ✅ обновляем частично
 @router.put("/{platform}/{user_id}", response_model=User)
 async def update_user(platform: str, user_id: int, data: dict = Body(...)):
-    result = await db.users.update_one(
-        {"user_id": user_id, "platform": platform}, {"$set": data}
-    )
-
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    updated = await db.users.find_one({"user_id": user_id, "platform": platform})
-
-    return updated
+    query = {"user_id": user_id, "platform": platform}
+    if not any(path.split(".")[0] in COUNTER_FIELDS for path in data):
+        # счётчики не меняются — один запрос
+        updated = await db.users.find_one_and_update(
+            query, {"$set": data}, return_document=ReturnDocument.AFTER
+        )
+        if updated is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return updated
+
+    # пользователь может перейти на другую платформу — меняются счётчики обеих
+    platforms = {platform, str(data.get("platform", platform))}
+    for _ in range(USER_UPDATE_ATTEMPTS):
+        async with user_changes(platforms) as incs:
+            before = await db.users.find_one(query, dict.fromkeys(COUNTER_FIELDS, 1))
+            if before is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            # прежние значения в фильтре: before точно то, что было до $set
+            guard = {field: before.get(field) for field in COUNTER_FIELDS}
+            updated = await db.users.find_one_and_update(
+                {**query, **guard},
+                {"$set": data},
+                return_document=ReturnDocument.AFTER,
+            )
+            if updated is not None:
+                add_user_change(incs, before, updated)
+                return updated
+
+    raise HTTPException(status_code=409, detail="User is being modified concurrently")
 
 
 @router.post("/", response_model=User)
@@ -133,29 +167,79 @@ async def create_user(user: User):
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
 
-    await db.users.insert_one(user.dict())
+    async with user_changes([user.platform]) as incs:
+        await db.users.insert_one(user.dict())
+        add_user_change(incs, None, user.dict())
     return user
 
 
+@router.post("/bulk")
+async def bulk_upsert(
+    request: Request,
+    ordered: bool = Query(
+        False, description="Остановиться на первой ошибке (иначе — пропустить запись)"
+    ),
+    batch_size: int = Query(
+        BULK_BATCH_SIZE, gt=0, le=5000, description="Записей в одном bulk_write"
+    ),
+):
+    """
+    Upsert пользователей по (platform, user_id) из JSON-массива или NDJSON.
+    Тело читается потоком. Возвращает счётчики и ошибки по пачкам.
+    """
+    return await bulk_upsert_users(request.stream(), ordered, batch_size)
+
+
 @router.delete("/{platform}/{user_id}")
 async def delete_user(platform: str, user_id: int):
-    result = await db.users.delete_one({"user_id": user_id, "platform": platform})
-
-    if result.deleted_count == 0:
+    async with user_changes([platform]) as incs:
+        deleted = await db.users.find_one_and_delete(
+            {"user_id": user_id, "platform": platform}
+        )
+        if deleted is not None:
+            add_user_change(incs, deleted, None)
+
+    if deleted is None:
         raise HTTPException(status_code=404, detail="User not found")
 
     return {"message": "User deleted successfully"}
 
 
 @router.get("/schedule/send/{platform}/{time}", response_model=list[User])
-async def get_users_for_schedule(platform: str, time: str):
-
-    users = await db.users.find(
+async def get_users_for_schedule(
+    platform: str,
+    time: str,
+    response: Response,
+    cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+    limit: int = Query(10000, gt=0, le=10000),
+):
+    return await fetch_page(
+        db.users,
         {
             "platform": platform,
             "schedule_enabled": True,
             "schedule_time": time,
-        }
-    ).to_list(length=10000)
+        },
+        limit,
+        cursor,
+        response,
+    )
 
-    return users
+
+@router.get("/schedule/dispatch/{platform}/{time}")
+async def dispatch_schedule(
+    platform: str,
+    time: str,
+    date: date_type | None = Query(
+        None, description="Дата рассылки (по умолчанию сегодня)"
+    ),
+):
+    """
+    NDJSON: подписчик + готовое расписание на дату (группы или преподавателя).
+    Каждая группа и преподаватель считаются один раз на запрос.
+    """
+    target_date = date or date_type.today()
+    return StreamingResponse(
+        iter_dispatch_records(platform, time, target_date),
+        media_type="application/x-ndjson",
+    )
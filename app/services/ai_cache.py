@@ -0,0 +1,136 @@
+"""
+Кэш AI-описаний расписаний: LRU в памяти процесса + коллекция ai_descriptions.
+
+Ключ — хеш содержимого расписания, дня, версии шаблона промпта и модели,
+поэтому изменение расписания (или звонков) само даёт новый ключ, а старые
+записи удаляются TTL-индексом MongoDB через AI_CACHE_TTL секунд.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decouple import config
+from fastapi.encoders import jsonable_encoder
+from app.database import db
+from app.services.schedule_format import canonical_day
+
+AI_CACHE_COLLECTION = "ai_descriptions"
+
+AI_CACHE_TTL = config("AI_CACHE_TTL", default=7 * 24 * 3600, cast=int)
+AI_CACHE_MAX_ENTRIES = config("AI_CACHE_MAX_ENTRIES", default=1000, cast=int)
+
+
+# поля, которые не влияют на ключ: служебные и день/ФИО в написании клиента
+_IGNORED_FIELDS = ("_id", "updated_at", "day", "filtered_by_day", "teacher_fio")
+
+
+def description_key(kind: str, schedule, day: str | None, **parts) -> str:
+    """
+    Хеш входа описания: только содержимое, день — в каноническом виде
+    ('пн' и 'Понедельник' дают один ключ, прогрев кэша попадает в запросы).
+    """
+    content = jsonable_encoder(schedule)
+    if isinstance(content, dict):
+        content = {k: v for k, v in content.items() if k not in _IGNORED_FIELDS}
+    payload = json.dumps(
+        {
+            "kind": kind,
+            "schedule": content,
+            "day": (canonical_day(day) or day) if day else None,
+            **parts,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _age_seconds(created_at: datetime) -> float:
+    # created_at пишется в UTC (как и считает TTL-индекс), MongoDB отдаёт без зоны
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - created_at).total_seconds()
+
+
+class AIDescriptionCache:
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ключ -> (текст, истекает в monotonic)
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.coalesced = 0  # запросы, дождавшиеся чужой генерации
+        self.llm_calls = 0
+        self.llm_errors = 0
+        self.llm_seconds = 0.0
+        self.llm_max_seconds = 0.0
+
+    def _remember(self, key: str, text: str, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (text, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            del self._entries[key]
+
+        doc = await db[AI_CACHE_COLLECTION].find_one({"_id": key})
+        # TTL-монитор MongoDB удаляет записи с задержкой — проверяем сами
+        age = _age_seconds(doc["created_at"]) if doc else None
+        if age is not None and age < self.ttl:
+            self._remember(key, doc["text"], time.monotonic() + self.ttl - age)
+            self.db_hits += 1
+            return doc["text"]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, text: str, **meta):
+        self._remember(key, text, time.monotonic() + self.ttl)
+        await db[AI_CACHE_COLLECTION].replace_one(
+            {"_id": key},
+            {"text": text, "created_at": datetime.now(timezone.utc), **meta},
+            upsert=True,
+        )
+
+    def record_llm_call(self, seconds: float, failed: bool = False):
+        self.llm_calls += 1
+        self.llm_errors += failed
+        self.llm_seconds += seconds
+        self.llm_max_seconds = max(self.llm_max_seconds, seconds)
+
+    def stats(self):
+        lookups = self.memory_hits + self.db_hits + self.misses
+        hits = self.memory_hits + self.db_hits
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "llm_calls": self.llm_calls,
+            "llm_errors": self.llm_errors,
+            "llm_avg_seconds": (
+                round(self.llm_seconds / self.llm_calls, 3) if self.llm_calls else 0.0
+            ),
+            "llm_max_seconds": round(self.llm_max_seconds, 3),
+        }
+
+
+ai_cache = AIDescriptionCache(AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL)
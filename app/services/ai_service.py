@@ -1,40 +1,306 @@
-import json
+import asyncio
+import re
+import time
 
+from decouple import config
 from fastapi.encoders import jsonable_encoder
-from openai import OpenAI
+from openai import AsyncOpenAI, Timeout
 from typing import List, Dict, Any
+from app.services.ai_cache import ai_cache, description_key
+from app.services.prompt_encoding import encode_schedule, encoding_hint
+from app.services.teacher_index import teacher_key
+
+OPENROUTER_MODEL = config(
+    "OPENROUTER_MODEL", default="arcee-ai/trinity-large-preview:free"
+)
+# совместимый с OpenAI chat-completions сервер (для нагрузочных тестов —
+# локальная заглушка benchmarks/fake_llm.py)
+OPENROUTER_BASE_URL = config(
+    "OPENROUTER_BASE_URL", default="https://openrouter.ai/api/v1"
+)
+# ключ только из окружения (.env): без него работает всё, кроме AI
+OPENROUTER_API_KEY = config("OPENROUTER_API_KEY", default=None)
+
+AI_TIMEOUT = config("AI_TIMEOUT", default=120.0, cast=float)
+AI_CONNECT_TIMEOUT = config("AI_CONNECT_TIMEOUT", default=10.0, cast=float)
+AI_MAX_RETRIES = config("AI_MAX_RETRIES", default=2, cast=int)
+
+# версия шаблонов промптов: входит в ключ кэша описаний и задаёт
+# формат расписания в промпте (prompt_encoding.PROMPT_ENCODINGS)
+PROMPT_VERSION = config("AI_PROMPT_VERSION", default="3")
+
+# одновременных запросов к модели на процесс
+AI_MAX_CONCURRENCY = config("AI_MAX_CONCURRENCY", default=8, cast=int)
+
+# один асинхронный клиент на процесс: общий пул соединений с keep-alive
+_client: AsyncOpenAI | None = None
+_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+
+# описания, которые сейчас генерируются: ключ кэша -> задача
+_inflight: dict[str, asyncio.Task] = {}
+# потоковые генерации из _inflight: задача -> её токены для подписчиков
+_feeds: dict[asyncio.Task, "TokenFeed"] = {}
+
+
+def ai_available() -> bool:
+    """Задан ли ключ OpenRouter (без него AI-эндпоинты отвечают 503)"""
+    return bool(OPENROUTER_API_KEY)
+
+
+def get_ai_client() -> AsyncOpenAI:
+    global _client
+    if not ai_available():
+        raise RuntimeError("OPENROUTER_API_KEY не задан")
+    if _client is None:
+        _client = AsyncOpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=OPENROUTER_API_KEY,
+            timeout=Timeout(AI_TIMEOUT, connect=AI_CONNECT_TIMEOUT),
+            max_retries=AI_MAX_RETRIES,
+        )
+    return _client
 
-OPENROUTER_MODEL = "arcee-ai/trinity-large-preview:free"
 
+async def close_ai_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# строка-разделитель разделов ответа
+SECTION_SEPARATOR_RE = re.compile(r"^[ \t]*---[ \t]*\r?\n", re.MULTILINE)
+SECTION_NAMES = ("intro", "lessons", "analysis")
+
+
+class SectionSplitter:
+    """Режет поток текста на разделы по строкам "---" по мере их завершения"""
 
-class AIService:
     def __init__(self):
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key="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",
+        self.buffer = ""
+        self.index = 0
+
+    def _section(self, text: str) -> dict:
+        name = (
+            SECTION_NAMES[self.index]
+            if self.index < len(SECTION_NAMES)
+            else f"section_{self.index}"
         )
+        self.index += 1
+        return {"name": name, "index": self.index - 1, "text": text.strip()}
 
-    def ask(self, user_message: str, system_message: str) -> str:
+    def feed(self, text: str) -> list[dict]:
+        self.buffer += text
+        sections = []
+        while match := SECTION_SEPARATOR_RE.search(self.buffer):
+            sections.append(self._section(self.buffer[: match.start()]))
+            self.buffer = self.buffer[match.end() :]
+        return sections
 
-        response = self.client.chat.completions.create(
-            model=OPENROUTER_MODEL,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message},
-            ],
-            # extra_body={"reasoning": {"enabled": True}},
-        )
+    def finish(self) -> list[dict]:
+        # последний разделитель может стоять в самом конце без перевода строки
+        tail = re.sub(r"\n[ \t]*---[ \t]*$", "", self.buffer)
+        self.buffer = ""
+        return [self._section(tail)] if tail.strip() else []
+
+
+class TokenFeed:
+    """
+    Токены одной потоковой генерации для всех подписчиков: каждый получает
+    уже пришедшие части и дальше — новые, по мере генерации.
+    """
+
+    def __init__(self):
+        self.tokens: list[str] = []
+        self.closed = False
+        self._updated = asyncio.Event()
+
+    def push(self, token: str):
+        self.tokens.append(token)
+        self._updated.set()
+
+    def close(self):
+        self.closed = True
+        self._updated.set()
+
+    async def follow(self):
+        sent = 0
+        while True:
+            if sent < len(self.tokens):
+                batch = self.tokens[sent:]
+                sent += len(batch)
+                for token in batch:
+                    yield token
+            elif self.closed:
+                return
+            else:
+                self._updated.clear()
+                await self._updated.wait()
+
+
+def _forget_inflight(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    _feeds.pop(task, None)
+    # ошибку получают ожидающие; если их не осталось — не шумим в лог
+    if not task.cancelled():
+        task.exception()
+
+
+def _start_inflight(key: str, coro) -> asyncio.Task:
+    """Запускает генерацию описания key, которую дождутся все его запросы"""
+    task = asyncio.create_task(coro)
+    _inflight[key] = task
+    task.add_done_callback(lambda done: _forget_inflight(key, done))
+    return task
+
+
+class AIService:
+    def __init__(self):
+        self.client = get_ai_client()
+
+    async def ask(self, user_message: str, system_message: str) -> str:
+
+        # не больше AI_MAX_CONCURRENCY запросов к модели одновременно
+        async with _semaphore:
+            response = await self.client.chat.completions.create(
+                model=OPENROUTER_MODEL,
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": user_message},
+                ],
+                # extra_body={"reasoning": {"enabled": True}},
+            )
 
         return response.choices[0].message.content
 
-    async def describe_schedule(self, schedule, day: str | None):
+    async def stream(self, user_message: str, system_message: str):
+        """Текст ответа модели по частям, по мере генерации"""
+        async with _semaphore:
+            response = await self.client.chat.completions.create(
+                model=OPENROUTER_MODEL,
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": user_message},
+                ],
+                stream=True,
+            )
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def _cached_stream(self, key: str, prompt: str, system_prompt: str, meta):
+        """
+        События (тип, данные) описания: token — часть текста, section —
+        завершённый раздел между "---", done — конец. Ответ из кэша
+        отдаётся сразу разделами, без token. Генерация общая с остальными
+        запросами того же описания (потоковыми и обычными).
+        """
+        splitter = SectionSplitter()
+        cached = await ai_cache.get(key)
+        if cached is None:
+            task = _inflight.get(key)
+            if task is None:
+                feed = TokenFeed()
+                task = _start_inflight(
+                    key, self._generate_stream(key, prompt, system_prompt, meta, feed)
+                )
+                _feeds[task] = feed
+            else:
+                # такое же описание уже генерируется — подключаемся к нему
+                ai_cache.coalesced += 1
+                feed = _feeds.get(task)
+            if feed is None:
+                # обычная генерация: токенов нет, ждём текст целиком
+                cached = await asyncio.shield(task)
+        if cached is not None:
+            for section in splitter.feed(cached) + splitter.finish():
+                yield "section", section
+            yield "done", {"cached": True}
+            return
+
+        async for token in feed.follow():
+            yield "token", {"text": token}
+            for section in splitter.feed(token):
+                yield "section", section
+        # ошибка генерации — здесь; отключение клиента её не отменяет
+        await asyncio.shield(task)
+
+        for section in splitter.finish():
+            yield "section", section
+        yield "done", {"cached": False}
+
+    async def _generate_stream(
+        self, key: str, prompt: str, system_prompt: str, meta, feed: TokenFeed
+    ):
+        """Потоковый ответ модели в feed (с замером времени) с сохранением в кэш"""
+        started = time.perf_counter()
+        try:
+            async for token in self.stream(prompt, system_prompt):
+                feed.push(token)
+        except Exception:
+            ai_cache.record_llm_call(time.perf_counter() - started, failed=True)
+            raise
+        finally:
+            feed.close()
+        ai_cache.record_llm_call(time.perf_counter() - started)
+
+        text = "".join(feed.tokens)
+        await ai_cache.put(
+            key, text, model=OPENROUTER_MODEL, prompt_version=PROMPT_VERSION, **meta
+        )
+        return text
+
+    async def _cached_ask(self, key: str, prompt: str, system_prompt: str, **meta):
+        """
+        Ответ из кэша описаний или от модели. Одинаковые одновременные
+        запросы ждут одну генерацию (single-flight), а не вызывают модель
+        каждый сам.
+        """
+        cached = await ai_cache.get(key)
+        if cached is not None:
+            return cached
+
+        task, _ = self._inflight_task(key, prompt, system_prompt, meta)
+        # отключение одного клиента не отменяет генерацию для остальных
+        return await asyncio.shield(task)
+
+    def _inflight_task(self, key: str, prompt: str, system_prompt: str, meta):
+        """(задача генерации key, запущена ли она сейчас) — новая или уже идущая"""
+        task = _inflight.get(key)
+        if task is not None:
+            ai_cache.coalesced += 1
+            return task, False
+        task = _start_inflight(key, self._generate(key, prompt, system_prompt, meta))
+        return task, True
+
+    async def _generate(self, key: str, prompt: str, system_prompt: str, meta):
+        """Ответ модели (с замером времени) с сохранением в кэш"""
+        started = time.perf_counter()
+        try:
+            text = await self.ask(prompt, system_prompt)
+        except Exception:
+            ai_cache.record_llm_call(time.perf_counter() - started, failed=True)
+            raise
+        ai_cache.record_llm_call(time.perf_counter() - started)
+
+        await ai_cache.put(
+            key, text, model=OPENROUTER_MODEL, prompt_version=PROMPT_VERSION, **meta
+        )
+        return text
+
+    def _schedule_request(
+        self, schedule, day: str | None, prompt_version: str = PROMPT_VERSION
+    ):
+        """(ключ кэша, промпт, системный промпт, метаданные) описания группы"""
 
         schedule_json = jsonable_encoder(schedule)
+        schedule_text = encode_schedule(schedule_json, "group", prompt_version)
 
         prompt = f"""
-    Вот расписание группы в формате JSON:
+    Вот расписание группы {encoding_hint(prompt_version)}:
 
-    {json.dumps(schedule_json, ensure_ascii=False, indent=2)}
+    {schedule_text}
 
     Если указан день недели — это расписание только на этот день.
 
@@ -71,16 +337,32 @@ class AIService:
     Строго соблюдай формат с разделителями "---".
     """
 
-        return self.ask(prompt, system_prompt)
-
-    async def describe_teacher_schedule(self, schedule, fio: str, day: str | None):
+        key = description_key(
+            "group", schedule_json, day, prompt=prompt_version, model=OPENROUTER_MODEL
+        )
+        return key, prompt, system_prompt, {"kind": "group", "day": day}
+
+    def _teacher_request(
+        self,
+        schedule,
+        fio: str,
+        day: str | None,
+        prompt_version: str = PROMPT_VERSION,
+        teacher_keys: list[str] | None = None,
+    ):
+        """
+        (ключ кэша, промпт, системный промпт, метаданные) описания преподавателя.
+        teacher_keys — ключи индекса, к которым свелось ФИО: по ним, а не по
+        написанию клиента ('Иванов' или 'Иванов И.И.'), строится ключ кэша.
+        """
 
         schedule_json = jsonable_encoder(schedule)
+        schedule_text = encode_schedule(schedule_json, "teacher", prompt_version)
 
         prompt = f"""
-    Вот расписание преподавателя {fio} в формате JSON:
+    Вот расписание преподавателя {fio} {encoding_hint(prompt_version)}:
 
-    {json.dumps(schedule_json, ensure_ascii=False, indent=2)}
+    {schedule_text}
 
     День: {day if day else "вся неделя"}
 
@@ -116,4 +398,36 @@ class AIService:
     Строго соблюдай формат с разделителями "---".
     """
 
-        return self.ask(prompt, system_prompt)
+        key = description_key(
+            "teacher",
+            schedule_json,
+            day,
+            teacher=(
+                ",".join(sorted(teacher_keys)) if teacher_keys else teacher_key(fio)
+            ),
+            prompt=prompt_version,
+            model=OPENROUTER_MODEL,
+        )
+        return key, prompt, system_prompt, {"kind": "teacher", "day": day}
+
+    async def describe_schedule(self, schedule, day: str | None):
+        key, prompt, system_prompt, meta = self._schedule_request(schedule, day)
+        return await self._cached_ask(key, prompt, system_prompt, **meta)
+
+    async def describe_teacher_schedule(
+        self, schedule, fio: str, day: str | None, teacher_keys: list[str] | None = None
+    ):
+        key, prompt, system_prompt, meta = self._teacher_request(
+            schedule, fio, day, teacher_keys=teacher_keys
+        )
+        return await self._cached_ask(key, prompt, system_prompt, **meta)
+
+    def describe_schedule_stream(self, schedule, day: str | None):
+        return self._cached_stream(*self._schedule_request(schedule, day))
+
+    def describe_teacher_schedule_stream(
+        self, schedule, fio: str, day: str | None, teacher_keys: list[str] | None = None
+    ):
+        return self._cached_stream(
+            *self._teacher_request(schedule, fio, day, teacher_keys=teacher_keys)
+        )
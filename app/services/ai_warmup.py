@@ -0,0 +1,240 @@
+"""
+Прогрев кэша AI-описаний после загрузки расписания и изменения звонков.
+
+Задача в фоне генерирует описания каждой группы на каждый её учебный день
+и самых запрашиваемых преподавателей (пока запросов нет — с наибольшим
+числом пар), чтобы первый запрос после загрузки не ждал модель.
+Включается AI_WARMUP_ENABLED. Одновременно идёт одна задача: новая
+загрузка отменяет предыдущую. К модели — не больше AI_WARMUP_CONCURRENCY
+запросов; при 429 все воркеры задачи ждут (Retry-After или экспоненциально).
+"""
+
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime
+from decouple import config
+from fastapi import HTTPException
+from openai import RateLimitError
+from app.database import db
+from app.services.ai_cache import ai_cache
+from app.services.ai_service import AIService, ai_available
+from app.services.schedule_service import ScheduleService
+from app.services.teacher_search import get_teacher_search_index
+
+AI_WARMUP_ENABLED = config("AI_WARMUP_ENABLED", default=False, cast=bool)
+AI_WARMUP_CONCURRENCY = config("AI_WARMUP_CONCURRENCY", default=2, cast=int)
+AI_WARMUP_TEACHERS = config("AI_WARMUP_TEACHERS", default=20, cast=int)
+AI_WARMUP_RETRIES = config("AI_WARMUP_RETRIES", default=3, cast=int)
+AI_WARMUP_BACKOFF = config("AI_WARMUP_BACKOFF", default=5.0, cast=float)
+
+# запросы AI-описаний преподавателей в этом процессе: ключ -> число
+_teacher_requests = Counter()
+_job_ids = itertools.count(1)
+_job = None
+# генерации, запущенные прогревом: они под shield и переживают отмену задачи
+_generations: set[asyncio.Task] = set()
+
+
+def note_teacher_request(teacher_keys: list[str]):
+    """
+    Учитывает запрос описания преподавателя для выбора, кого прогревать.
+    teacher_keys — ключи индекса, к которым свелось введённое ФИО.
+    """
+    _teacher_requests.update(teacher_keys)
+
+
+def _retry_after(error: RateLimitError, attempt: int) -> float:
+    header = error.response.headers.get("retry-after") if error.response else None
+    try:
+        return max(float(header), 0.0)
+    except (TypeError, ValueError):
+        return AI_WARMUP_BACKOFF * 2**attempt
+
+
+class WarmupJob:
+    def __init__(self, reason: str):
+        self.id = next(_job_ids)
+        self.reason = reason
+        self.status = "preparing"
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.error = None
+
+        self.total = 0
+        self.generated = 0
+        self.cached = 0  # уже были в кэше
+        self.skipped = 0  # расписание исчезло или пустое
+        self.failed = 0
+        self.rate_limited = 0
+
+        self.service = AIService()
+        self.task: asyncio.Task | None = None
+        self._resume_at = 0.0  # loop.time(), до которого ждём после 429
+
+    def progress(self) -> dict:
+        done = self.generated + self.cached + self.skipped + self.failed
+        return {
+            "id": self.id,
+            "reason": self.reason,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total": self.total,
+            "done": done,
+            "percent": round(100 * done / self.total, 1) if self.total else 0.0,
+            "generated": self.generated,
+            "cached": self.cached,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "error": self.error,
+        }
+
+    async def _targets(self) -> list[tuple]:
+        """Что прогревать: ("group", группа, день) и ("teacher", ФИО, ключ, день)"""
+        targets = []
+        groups = await db.schedules.distinct("group_name")
+        for group in sorted(groups):
+            model = await ScheduleService.get_schedule_by_group(group, None)
+            # в расписании все дни недели, пустые описывать незачем
+            days = ScheduleService.lesson_days(model)
+            targets.extend(("group", group, day) for day in days)
+
+        index = await get_teacher_search_index()
+        requested = [key for key, _ in _teacher_requests.most_common()]
+        keys = list(dict.fromkeys(requested + [t["key"] for t in index.teachers]))
+        for key in [key for key in keys if key in index.by_key][:AI_WARMUP_TEACHERS]:
+            name = index.by_key[key]["name"]
+            schedule = await ScheduleService.get_teacher_schedule(name, None, key)
+            days = dict.fromkeys(
+                itertools.chain(
+                    schedule.schedule.first_shift, schedule.schedule.second_shift
+                )
+            )
+            targets.extend(("teacher", name, key, day) for day in days)
+        return targets
+
+    def _request(self, target: tuple, schedule):
+        if target[0] == "group":
+            return self.service._schedule_request(schedule, target[2])
+        # ключ кэша — как у запроса, чьё ФИО свелось к этому преподавателю
+        return self.service._teacher_request(
+            schedule, target[1], target[3], teacher_keys=[target[2]]
+        )
+
+    async def _schedule(self, target: tuple):
+        if target[0] == "group":
+            return await ScheduleService.get_schedule_by_group(target[1], target[2])
+        _, fio, key, day = target
+        return await ScheduleService.get_teacher_schedule(fio, day, key)
+
+    async def _warm(self, target: tuple):
+        try:
+            schedule = await self._schedule(target)
+        except HTTPException:
+            self.skipped += 1
+            return
+        key, prompt, system_prompt, meta = self._request(target, schedule)
+        if await ai_cache.get(key) is not None:
+            self.cached += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(AI_WARMUP_RETRIES + 1):
+            delay = self._resume_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task, started = self.service._inflight_task(
+                key, prompt, system_prompt, meta
+            )
+            if started:
+                _generations.add(task)
+                task.add_done_callback(_generations.discard)
+            try:
+                await asyncio.shield(task)
+            except RateLimitError as e:
+                self.rate_limited += 1
+                self._resume_at = max(
+                    self._resume_at, loop.time() + _retry_after(e, attempt)
+                )
+                continue
+            except Exception as e:
+                print(f"❌ Прогрев AI-описаний: {target}: {e}")
+                self.failed += 1
+                return
+            self.generated += 1
+            return
+        self.failed += 1
+
+    async def _worker(self, targets):
+        for target in targets:
+            await self._warm(target)
+
+    async def run(self):
+        try:
+            targets = await self._targets()
+            self.total = len(targets)
+            self.status = "running"
+            # общий итератор: каждый воркер берёт следующую цель
+            shared = iter(targets)
+            await asyncio.gather(
+                *(self._worker(shared) for _ in range(max(AI_WARMUP_CONCURRENCY, 1)))
+            )
+            self.status = "done"
+            print(
+                f"🔥 Прогрев AI-описаний #{self.id}: сгенерировано {self.generated}, "
+                f"из кэша {self.cached}, ошибок {self.failed}"
+            )
+        except asyncio.CancelledError:
+            if self.status != "superseded":
+                self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"❌ Прогрев AI-описаний #{self.id} прерван: {e}")
+        finally:
+            self.finished_at = datetime.now()
+
+
+def start_warmup(reason: str) -> WarmupJob | None:
+    """Запускает прогрев, отменяя текущий. None — прогрев выключен (или нет ключа)."""
+    global _job
+    if not AI_WARMUP_ENABLED or not ai_available():
+        return None
+    if _job is not None and not _job.task.done():
+        _job.status = "superseded"
+        _job.task.cancel()
+    _job = WarmupJob(reason)
+    _job.task = asyncio.create_task(_job.run())
+    return _job
+
+
+async def cancel_warmup(generations: bool = False) -> bool:
+    """
+    Отменяет текущий прогрев; False — отменять нечего.
+    generations=True (остановка приложения) — отменяет и запущенные прогревом
+    генерации: без этого они доработали бы под shield после отмены задачи.
+    """
+    cancelled = _job is not None and not _job.task.done()
+    if cancelled:
+        _job.task.cancel()
+        try:
+            await _job.task
+        except asyncio.CancelledError:
+            pass
+    if generations and _generations:
+        pending = list(_generations)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return cancelled
+
+
+def get_warmup_progress() -> dict:
+    return {
+        "enabled": AI_WARMUP_ENABLED and ai_available(),
+        "concurrency": AI_WARMUP_CONCURRENCY,
+        "job": _job.progress() if _job is not None else None,
+    }
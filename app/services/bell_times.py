@@ -0,0 +1,179 @@
+"""
+Расписание звонков (коллекция bell_schedules).
+
+Основное расписание и переопределения отдельных дней хранятся как есть,
+по документу на каждое, с номером версии. Из них собирается таблица
+(день, смена) -> {номер пары: время}, которая накладывается на пары при
+чтении. Загрузка звонков — одна запись и новое поколение расписания,
+документы групп не переписываются.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from app.database import db
+from app.services.schedule_cache import bump_schedule_generation, schedule_cache
+from app.services.schedule_format import CANONICAL_DAYS
+from app.utils.common import normalize_day_name
+from app.utils.http_cache import latest
+
+BELL_COLLECTION = "bell_schedules"
+MAIN_ID = "main"
+OVERRIDES_ID = "overrides"
+
+# файлы, в которых звонки хранились раньше (импортируются при старте)
+MAIN_BELL_FILE = "bell_schedule.json"
+OVERRIDE_FILE = "bell_schedule_overrides.json"
+
+# дни с общим расписанием звонков и варианты общего ключа в файле
+TUE_THU_DAYS = ("вторник", "среда", "четверг")
+TUE_THU_KEYS = ("вторник-четверг", "вторник_четверг")
+
+
+def _day_bells(bell_data: dict, day_key: str) -> dict:
+    """
+    {"1_shift": {...}, "2_shift": {...}} для дня. Ключ самого дня важнее
+    общего 'вторник-четверг' / 'вторник_четверг'.
+    """
+    by_day = {normalize_day_name(k): v for k, v in bell_data.items()}
+    if day_key in by_day:
+        return by_day[day_key] or {}
+    if day_key in TUE_THU_DAYS:
+        for key in TUE_THU_KEYS:
+            if key in bell_data:
+                return bell_data[key] or {}
+    return {}
+
+
+def compile_bell_table(main: dict, overrides: dict) -> dict:
+    """
+    (канонический день, смена) -> {номер пары: время}.
+    Времена переопределений заменяют основные для своих пар.
+    """
+    table = {}
+    for day in CANONICAL_DAYS:
+        day_key = day.lower()
+        main_day = _day_bells(main, day_key)
+        override_day = _day_bells(overrides, day_key)
+        for shift_key in {**main_day, **override_day}:
+            if not shift_key.endswith("_shift"):
+                continue
+            times = {}
+            for source in (main_day, override_day):
+                for num, time_str in (source.get(shift_key) or {}).items():
+                    if time_str:
+                        times[str(num).strip()] = time_str
+            if times:
+                table[(day, shift_key.removesuffix("_shift"))] = times
+    return table
+
+
+class BellTable:
+    """
+    Скомпилированное расписание звонков. updated_at — время последней
+    загрузки звонков: входит в Last-Modified расписаний групп.
+    """
+
+    def __init__(
+        self, version: str | None, table: dict, updated_at: datetime | None = None
+    ):
+        self.version = version
+        self.table = table
+        self.updated_at = updated_at
+
+    def time_for(self, day: str, shift, lesson_num) -> str | None:
+        return self.table.get((day, str(shift)), {}).get(str(lesson_num).strip())
+
+    def apply(self, schedule: dict, shift):
+        """Проставляет time парам расписания {zero_lesson, days} (на месте)"""
+        for day, lesson in (schedule.get("zero_lesson") or {}).items():
+            time_str = self.time_for(day, shift, "0")
+            if lesson and time_str:
+                lesson["time"] = time_str
+        for day, lessons in (schedule.get("days") or {}).items():
+            for num, lesson in lessons.items():
+                time_str = self.time_for(day, shift, num)
+                if lesson and time_str:
+                    lesson["time"] = time_str
+        return schedule
+
+
+_bell_table = BellTable(None, {})
+_loaded_generation = None
+_load_lock = asyncio.Lock()
+
+
+async def get_bell_table() -> BellTable:
+    """Таблица звонков текущего поколения расписания (перечитывается при его смене)"""
+    global _bell_table, _loaded_generation
+
+    await schedule_cache.sync_generation()
+    generation = schedule_cache.generation
+    if _bell_table.version is not None and generation == _loaded_generation:
+        return _bell_table
+
+    async with _load_lock:
+        if _bell_table.version is None or generation != _loaded_generation:
+            docs = {d["_id"]: d async for d in db[BELL_COLLECTION].find()}
+            main = docs.get(MAIN_ID) or {}
+            overrides = docs.get(OVERRIDES_ID) or {}
+            _bell_table = BellTable(
+                f"{main.get('version', 0)}.{overrides.get('version', 0)}",
+                compile_bell_table(main.get("data") or {}, overrides.get("data") or {}),
+                latest(main.get("updated_at"), overrides.get("updated_at")),
+            )
+            _loaded_generation = generation
+    return _bell_table
+
+
+async def _save(doc_id: str, update: dict) -> int:
+    doc = await db[BELL_COLLECTION].find_one_and_update(
+        {"_id": doc_id},
+        {**update, "$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    # новое поколение: кэши расписаний пересобираются с новыми звонками
+    await bump_schedule_generation()
+    return doc["version"]
+
+
+async def save_main_bells(bell_data: dict) -> int:
+    """Заменяет основное расписание звонков. Возвращает его версию."""
+    return await _save(
+        MAIN_ID, {"$set": {"data": bell_data, "updated_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def save_override_bells(override_data: dict) -> int:
+    """Добавляет/заменяет переопределения для указанных дней"""
+    fields = {
+        f"data.{normalize_day_name(day)}": value for day, value in override_data.items()
+    }
+    return await _save(
+        OVERRIDES_ID, {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def clear_override_bells() -> int:
+    return await _save(
+        OVERRIDES_ID, {"$set": {"data": {}, "updated_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def import_legacy_bell_files():
+    """Переносит звонки из JSON-файлов в MongoDB, если там их ещё нет"""
+    for doc_id, path in ((MAIN_ID, MAIN_BELL_FILE), (OVERRIDES_ID, OVERRIDE_FILE)):
+        if not os.path.exists(path):
+            continue
+        if await db[BELL_COLLECTION].find_one({"_id": doc_id}, {"_id": 1}):
+            continue
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if doc_id == MAIN_ID:
+            await save_main_bells(data)
+        else:
+            await save_override_bells(data)
+        print(f"✅ Звонки импортированы из {path}")
@@ -0,0 +1,83 @@
+"""
+Лента рассылки расписаний.
+
+Для подписчиков платформы с заданным временем рассылки отдаёт NDJSON:
+по строке на пользователя с уже готовым расписанием на нужную дату.
+Расписание каждой группы и каждого преподавателя считается и сериализуется
+один раз и переиспользуется для всех его подписчиков.
+"""
+
+import json
+from datetime import date as date_type
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from app.database import db
+from app.models.schedule import Schedule
+from app.models.user import User
+from app.services.schedule_format import CANONICAL_DAYS
+from app.services.schedule_service import ScheduleService
+
+
+def dispatch_day(target_date: date_type) -> str | None:
+    """Канонический день недели даты; None для воскресенья"""
+    weekday = target_date.weekday()
+    return CANONICAL_DAYS[weekday] if weekday < len(CANONICAL_DAYS) else None
+
+
+def _dumps(value) -> str:
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False)
+
+
+def _user_target(user: dict):
+    """('teacher', ФИО) или ('group', группа); None, если рассылать нечего"""
+    if user.get("role") == "teacher" and user.get("teacher_fio"):
+        return "teacher", user["teacher_fio"]
+    if user.get("group_name"):
+        return "group", user["group_name"]
+    return None
+
+
+async def _render_target(kind: str, name: str, day: str | None) -> str:
+    """JSON-фрагмент {"status", "detail", "schedule"} для группы/преподавателя"""
+    if day is None:
+        return _dumps({"status": 204, "detail": "Выходной", "schedule": None})
+    try:
+        if kind == "teacher":
+            schedule = await ScheduleService.get_teacher_schedule(name, day)
+        else:
+            # тот же вид, что у GET /schedule/{group_name}?day=...
+            schedule = Schedule(
+                **await ScheduleService.get_schedule_by_group(name, day)
+            )
+    except HTTPException as e:
+        return _dumps({"status": e.status_code, "detail": e.detail, "schedule": None})
+    return _dumps({"status": 200, "detail": None, "schedule": schedule})
+
+
+async def iter_dispatch_records(platform: str, time: str, target_date: date_type):
+    """Строки NDJSON: {"user", "target", "date", "day", "result"}"""
+    day = dispatch_day(target_date)
+    rendered = {}  # (kind, name) -> JSON-фрагмент результата
+    head = f'"date":{_dumps(target_date)},"day":{_dumps(day)}'
+
+    cursor = db.users.find(
+        {"platform": platform, "schedule_enabled": True, "schedule_time": time}
+    )
+    async for user in cursor:
+        target = _user_target(user)
+        if target is None:
+            result = _dumps(
+                {"status": 400, "detail": "Не указана группа или ФИО", "schedule": None}
+            )
+        else:
+            if target not in rendered:
+                rendered[target] = await _render_target(*target, day)
+            result = rendered[target]
+
+        target_json = (
+            _dumps({"type": target[0], "name": target[1]}) if target else "null"
+        )
+        yield (
+            f'{{"user":{_dumps(User(**user))},"target":{target_json},'
+            f'{head},"result":{result}}}\n'
+        )
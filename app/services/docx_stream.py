@@ -0,0 +1,220 @@
+"""
+Потоковое чтение DOCX без python-docx.
+
+Читает word/document.xml прямо из zip-архива через iterparse и за один проход
+отдаёт параграфы и таблицы верхнего уровня в порядке документа.
+Объединённые ячейки (gridSpan / vMerge) и пропущенные колонки сетки в начале
+и конце строки (gridBefore / gridAfter) разрешаются здесь же, так что
+результат повторяет семантику python-docx `row.cells`, но текст каждой
+ячейки вычисляется ровно один раз.
+"""
+
+import zipfile
+import xml.etree.ElementTree as ET
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+W_BODY = W_NS + "body"
+W_P = W_NS + "p"
+W_R = W_NS + "r"
+W_HYPERLINK = W_NS + "hyperlink"
+W_TBL = W_NS + "tbl"
+W_TR = W_NS + "tr"
+W_TC = W_NS + "tc"
+W_TR_PR = W_NS + "trPr"
+W_TC_PR = W_NS + "tcPr"
+W_GRID_BEFORE = W_NS + "gridBefore"
+W_GRID_AFTER = W_NS + "gridAfter"
+W_GRID_SPAN = W_NS + "gridSpan"
+W_V_MERGE = W_NS + "vMerge"
+W_VAL = W_NS + "val"
+W_TYPE = W_NS + "type"
+
+# текстовые эквиваленты содержимого w:r (как в python-docx)
+W_T = W_NS + "t"
+W_TAB = W_NS + "tab"
+W_PTAB = W_NS + "ptab"
+W_BR = W_NS + "br"
+W_CR = W_NS + "cr"
+W_NO_BREAK_HYPHEN = W_NS + "noBreakHyphen"
+
+
+class StreamCell:
+    """Ячейка таблицы: текст и ширина в колонках сетки"""
+
+    __slots__ = ("text", "grid_span")
+
+    def __init__(self, text: str, grid_span: int = 1):
+        self.text = text
+        self.grid_span = grid_span
+
+
+class StreamRow:
+    """
+    Строка таблицы: ячейка на каждую занятую колонку сетки (объединённые
+    повторяются). Как и в python-docx, пропущенные колонки в начале и конце
+    строки в cells не попадают — их число в grid_cols_before / grid_cols_after.
+    """
+
+    __slots__ = ("cells", "grid_cols_before", "grid_cols_after")
+
+    def __init__(
+        self, cells: list, grid_cols_before: int = 0, grid_cols_after: int = 0
+    ):
+        self.cells = cells
+        self.grid_cols_before = grid_cols_before
+        self.grid_cols_after = grid_cols_after
+
+
+class StreamTable:
+    """Таблица с тем же интерфейсом, что и docx.table.Table: table.rows[i].cells"""
+
+    __slots__ = ("rows",)
+
+    def __init__(self, rows: list):
+        self.rows = rows
+
+
+def _run_text(r) -> str:
+    parts = []
+    for e in r:
+        tag = e.tag
+        if tag == W_T:
+            parts.append(e.text or "")
+        elif tag == W_TAB or tag == W_PTAB:
+            parts.append("\t")
+        elif tag == W_CR:
+            parts.append("\n")
+        elif tag == W_BR:
+            # разрыв страницы/колонки текста не даёт
+            if e.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag == W_NO_BREAK_HYPHEN:
+            parts.append("-")
+    return "".join(parts)
+
+
+def _paragraph_text(p) -> str:
+    """Текст параграфа: прямые w:r и w:r внутри w:hyperlink"""
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            for r in child:
+                if r.tag == W_R:
+                    parts.append(_run_text(r))
+    return "".join(parts)
+
+
+def _read_tc(tc):
+    """Возвращает (текст, gridSpan, vMerge) для w:tc"""
+    grid_span = 1
+    v_merge = None
+    paragraphs = []
+    for child in tc:
+        if child.tag == W_P:
+            paragraphs.append(_paragraph_text(child))
+        elif child.tag == W_TC_PR:
+            span_el = child.find(W_GRID_SPAN)
+            if span_el is not None:
+                grid_span = int(span_el.get(W_VAL, "1"))
+            merge_el = child.find(W_V_MERGE)
+            if merge_el is not None:
+                # w:vMerge без атрибута означает "continue"
+                v_merge = merge_el.get(W_VAL, "continue")
+    return "\n".join(paragraphs), grid_span, v_merge
+
+
+def _read_tr_pr(tr) -> tuple[int, int]:
+    """(gridBefore, gridAfter) строки: пропущенные колонки сетки до и после ячеек"""
+    tr_pr = tr.find(W_TR_PR)
+    if tr_pr is None:
+        return 0, 0
+    skipped = []
+    for tag in (W_GRID_BEFORE, W_GRID_AFTER):
+        el = tr_pr.find(tag)
+        skipped.append(int(el.get(W_VAL, "0")) if el is not None else 0)
+    return skipped[0], skipped[1]
+
+
+def _resolve_row(raw_cells: list, grid_before: int, prev_offsets: dict):
+    """
+    Разворачивает строку в ячейки по колонкам сетки.
+    Смещения считаются от начала сетки: первая ячейка стоит в колонке
+    grid_before, поэтому vMerge="continue" берёт ячейку той же колонки
+    предыдущей строки, даже если строки начинаются с разных колонок.
+    Возвращает (cells, offsets), где offsets: колонка сетки -> ячейка.
+    """
+    cells = []
+    offsets = {}
+    offset = grid_before
+    for text, grid_span, v_merge in raw_cells:
+        cell = None
+        if v_merge == "continue":
+            cell = prev_offsets.get(offset)
+        if cell is None:
+            cell = StreamCell(text, grid_span)
+        offsets[offset] = cell
+        cells.extend([cell] * cell.grid_span)
+        offset += grid_span
+    return cells, offsets
+
+
+def document_xml_size(file_path: str) -> int:
+    """Размер word/document.xml без распаковки (из оглавления zip)"""
+    with zipfile.ZipFile(file_path) as archive:
+        return archive.getinfo("word/document.xml").file_size
+
+
+def iter_docx_blocks(file_path: str):
+    """
+    Генерирует блоки тела документа в порядке следования:
+    ("p", текст) для параграфов и ("tbl", StreamTable) для таблиц.
+    Вложенные таблицы в ячейках, как и в python-docx, в текст ячейки не входят.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open("word/document.xml") as xml_file:
+            stack = []
+            tbl_depth = 0
+            rows = []
+            raw_cells = []
+            prev_offsets = {}
+
+            for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem)
+                    if elem.tag == W_TBL:
+                        tbl_depth += 1
+                        if tbl_depth == 1:
+                            rows = []
+                            prev_offsets = {}
+                    elif elem.tag == W_TR and tbl_depth == 1:
+                        raw_cells = []
+                    continue
+
+                stack.pop()
+                parent = stack[-1] if stack else None
+                tag = elem.tag
+
+                if tag == W_TC and tbl_depth == 1 and parent.tag == W_TR:
+                    raw_cells.append(_read_tc(elem))
+                    elem.clear()
+
+                elif tag == W_TR and tbl_depth == 1 and parent.tag == W_TBL:
+                    grid_before, grid_after = _read_tr_pr(elem)
+                    cells, prev_offsets = _resolve_row(
+                        raw_cells, grid_before, prev_offsets
+                    )
+                    rows.append(StreamRow(cells, grid_before, grid_after))
+                    elem.clear()
+
+                elif tag == W_TBL:
+                    tbl_depth -= 1
+                    if tbl_depth == 0 and parent is not None and parent.tag == W_BODY:
+                        yield "tbl", StreamTable(rows)
+                        parent.remove(elem)
+
+                elif tag == W_P and parent is not None and parent.tag == W_BODY:
+                    yield "p", _paragraph_text(elem)
+                    parent.remove(elem)
@@ -0,0 +1,126 @@
+"""
+Представление расписаний в промптах AI-описаний.
+
+json — исходный формат: json.dumps(..., indent=2) со всеми полями.
+compact — строка на пару без имён полей; поля стоят на своих местах
+(легенда позиционная), пустое поле — "—", пустые в конце строки опущены:
+
+    понедельник:
+    1. Математика; Иванов И.И.; ауд. 101; 08:30-10:00
+    2. Физика; —; ауд. 204
+
+Формат выбирается версией шаблона промпта (PROMPT_ENCODINGS), поэтому
+смена формата сама даёт новые ключи кэша описаний.
+"""
+
+import json
+from fastapi.encoders import jsonable_encoder
+
+# версия шаблона промпта -> формат расписания в нём; "2" был compact,
+# опускавший пустые поля посреди строки (позиции съезжали), — снят
+PROMPT_ENCODINGS = {"1": "json", "3": "compact"}
+
+# пустое поле посреди строки compact
+EMPTY_FIELD = "—"
+
+# как модели читать строку занятия в compact
+GROUP_LESSON_LEGEND = "номер. предмет; преподаватель; аудитория; время"
+TEACHER_LESSON_LEGEND = "номер. предмет; группа; аудитория; время"
+
+_SHIFTS = (("first_shift", "1 смена"), ("second_shift", "2 смена"))
+
+
+def _lesson_line(num: str, lesson: dict, fields: tuple[str, ...]) -> str | None:
+    values = []
+    for field in fields:
+        value = lesson.get(field)
+        if not value:
+            values.append(None)
+        else:
+            values.append(f"ауд. {value}" if field == "classroom" else str(value))
+    # хвост из пустых полей позиций не сдвигает
+    while values and values[-1] is None:
+        values.pop()
+    # пустая пара (например, нулевая без предмета) не нужна модели
+    if not values:
+        return None
+    return f"{num}. {'; '.join(value or EMPTY_FIELD for value in values)}"
+
+
+def _day_lines(days: dict, fields: tuple[str, ...], zero: dict | None = None):
+    zero = zero or {}
+    for day, lessons in days.items():
+        lines = [_lesson_line("0", zero.get(day) or {}, fields)]
+        lines.extend(
+            _lesson_line(num, lesson or {}, fields) for num, lesson in lessons.items()
+        )
+        lines = [line for line in lines if line]
+        if lines:
+            yield f"{day}:"
+            yield from lines
+    # нулевые пары в дни без основных
+    for day, lesson in zero.items():
+        line = _lesson_line("0", lesson or {}, fields)
+        if day not in days and line:
+            yield f"{day}:"
+            yield line
+
+
+def encode_group_schedule(schedule) -> str:
+    """Schedule (или расписание группы на день) в формате compact"""
+    data = jsonable_encoder(schedule)
+    lines = [f"Группа: {data.get('group_name')}"]
+    shift = (data.get("shift_info") or {}).get("shift")
+    if shift:
+        lines.append(f"Смена: {shift}")
+    lines.append(f"Строка занятия: {GROUP_LESSON_LEGEND}")
+
+    schedule_data = data.get("schedule") or {}
+    lines.extend(
+        _day_lines(
+            schedule_data.get("days") or {},
+            ("subject", "teacher", "classroom", "time"),
+            schedule_data.get("zero_lesson"),
+        )
+    )
+    return "\n".join(lines)
+
+
+def encode_teacher_schedule(schedule) -> str:
+    """TeacherScheduleResponse в формате compact"""
+    data = jsonable_encoder(schedule)
+    lines = [
+        f"Преподаватель: {data.get('teacher_fio')}",
+        f"Строка занятия: {TEACHER_LESSON_LEGEND}",
+    ]
+    shifts = data.get("schedule") or {}
+    for shift_key, title in _SHIFTS:
+        shift_lines = list(
+            _day_lines(
+                shifts.get(shift_key) or {}, ("subject", "group", "classroom", "time")
+            )
+        )
+        if shift_lines:
+            lines.append(f"{title}:")
+            lines.extend(shift_lines)
+    return "\n".join(lines)
+
+
+def encode_json(schedule) -> str:
+    return json.dumps(jsonable_encoder(schedule), ensure_ascii=False, indent=2)
+
+
+def encoding_hint(prompt_version: str) -> str:
+    """Как в промпте назвать формат расписания"""
+    if PROMPT_ENCODINGS.get(prompt_version, "json") == "json":
+        return "в формате JSON"
+    return f"(по строке на занятие, пустое поле — {EMPTY_FIELD})"
+
+
+def encode_schedule(schedule, kind: str, prompt_version: str) -> str:
+    """Расписание группы (kind="group") или преподавателя для шаблона prompt_version"""
+    if PROMPT_ENCODINGS.get(prompt_version, "json") == "json":
+        return encode_json(schedule)
+    if kind == "teacher":
+        return encode_teacher_schedule(schedule)
+    return encode_group_schedule(schedule)
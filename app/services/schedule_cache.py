@@ -0,0 +1,149 @@
+"""
+Кэш расписаний групп в памяти процесса.
+
+Расписания меняются только при загрузке, удалении и обновлении звонков,
+поэтому чтения обслуживаются из памяти. Актуальность привязана к глобальному
+номеру поколения в коллекции schedule_meta: любое изменение увеличивает его,
+и все процессы сбрасывают кэш (свой — сразу, остальные — при следующей
+проверке поколения, не чаще раза в SCHEDULE_CACHE_CHECK_INTERVAL секунд).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+import bson
+from decouple import config
+from pymongo import ReturnDocument
+from app.database import db
+
+META_COLLECTION = "schedule_meta"
+GENERATION_ID = "generation"
+
+CACHE_MAX_ENTRIES = config("SCHEDULE_CACHE_MAX_ENTRIES", default=2000, cast=int)
+CACHE_MAX_BYTES = config("SCHEDULE_CACHE_MAX_BYTES", default=64 * 1024 * 1024, cast=int)
+CACHE_CHECK_INTERVAL = config("SCHEDULE_CACHE_CHECK_INTERVAL", default=1.0, cast=float)
+
+
+def doc_size(doc: dict) -> int:
+    """Размер документа в BSON — оценка занимаемой памяти"""
+    return len(bson.encode(doc))
+
+
+class ScheduleCache:
+    """LRU-кэш с ограничением по числу записей и объёму, сбрасываемый по поколению"""
+
+    def __init__(self, max_entries: int, max_bytes: int, check_interval: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+
+        self.generation = None
+        self.generation_updated_at = None
+        self._checked_at = 0.0
+        self._check_lock = asyncio.Lock()
+
+        self._entries = OrderedDict()  # ключ -> (значение, размер)
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def set_generation(self, generation: int, updated_at: datetime | None):
+        if generation != self.generation:
+            self.clear()
+            if self.generation is not None:
+                self.invalidations += 1
+            self.generation = generation
+        self.generation_updated_at = updated_at
+        self._checked_at = time.monotonic()
+
+    async def sync_generation(self):
+        """Сверяет поколение с MongoDB, если с прошлой проверки прошло достаточно времени"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with self._check_lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            meta = await db[META_COLLECTION].find_one({"_id": GENERATION_ID}) or {}
+            self.set_generation(meta.get("value", 0), meta.get("updated_at"))
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, size: int):
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader):
+        """
+        Значение из кэша или loader() -> (значение, размер).
+        None от loader не кэшируется. Результат, загруженный во время
+        смены поколения, не сохраняется.
+        """
+        await self.sync_generation()
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        generation = self.generation
+        loaded = await loader()
+        if loaded is None:
+            return None
+        value, size = loaded
+        if generation == self.generation:
+            self.put(key, value, size)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "generation": self.generation,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+schedule_cache = ScheduleCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_CHECK_INTERVAL)
+
+
+async def bump_schedule_generation():
+    """Отмечает изменение расписаний: новое поколение для всех процессов"""
+    meta = await db[META_COLLECTION].find_one_and_update(
+        {"_id": GENERATION_ID},
+        {"$inc": {"value": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    schedule_cache.set_generation(meta["value"], meta.get("updated_at"))
+    return meta["value"]
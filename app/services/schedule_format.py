@@ -0,0 +1,111 @@
+"""
+Канонический формат хранения расписания (format_version = 3).
+
+    schedule.zero_lesson.<День>  -> занятие или {}
+    schedule.days.<День>         -> [{"num": "1.2", "order": 1002000, ...}, ...]
+
+Дни лежат под каноническими ключами ("Понедельник" ... "Суббота") в порядке
+недели, пары дня — массивом, уже отсортированным по order (lesson_rank, тот же
+ключ, что у teacher_lessons). Чтение только
+разворачивает массив обратно в {номер: занятие}, без сортировки и нормализации.
+Документы старого формата (пары словарём) по-прежнему читаются.
+"""
+
+from app.utils.common import normalize_day_name
+
+FORMAT_VERSION = 3
+
+CANONICAL_DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+DAY_INDEX = {day: idx for idx, day in enumerate(CANONICAL_DAYS)}
+_CANONICAL_BY_NORMALIZED = {day.lower(): day for day in CANONICAL_DAYS}
+
+# служебные поля занятия в хранимом массиве
+LESSON_META_FIELDS = ("num", "order")
+
+
+def canonical_day(day: str | None) -> str | None:
+    """'пн', 'Mon', 'понедельник' -> 'Понедельник'; None для неизвестного дня"""
+    return _CANONICAL_BY_NORMALIZED.get(normalize_day_name(day))
+
+
+def lesson_order(num) -> list[int]:
+    """Ключ сортировки номера пары: "4" -> [4, 0, 0], "1.2.1" -> [1, 2, 1]"""
+    try:
+        parts = [int(p) for p in str(num).split(".")]
+    except ValueError:
+        # Если ключ не число (на всякий случай), отправляем в конец
+        return [999, 0, 0]
+    return parts + [0] * (3 - len(parts))
+
+
+def lesson_rank(num) -> int:
+    """
+    Тот же порядок одним числом: "1.2" -> 1_002_000. Для сортировки в MongoDB —
+    массивы там сравниваются по минимальному элементу, а не поэлементно.
+    """
+    a, b, c = lesson_order(num)[:3]
+    return (a * 1000 + b) * 1000 + c
+
+
+def sort_lessons(lessons: dict) -> dict:
+    """Сортирует словарь пар по номерам: 1, 2, 2.1, 2.2, 2.2.1, 3"""
+    return {num: lessons[num] for num in sorted(lessons, key=lesson_rank)}
+
+
+def _ordered_days(section: dict) -> list[tuple[str, object]]:
+    """Дни секции под каноническими ключами в порядке недели"""
+    known = {}
+    unknown = []
+    for day_name, value in section.items():
+        canon = canonical_day(day_name)
+        if canon:
+            known[canon] = value
+        else:
+            unknown.append((day_name, value))
+    return [(day, known[day]) for day in CANONICAL_DAYS if day in known] + unknown
+
+
+def to_storage(schedule: dict) -> dict:
+    """Расписание вида {days: {день: {номер: занятие}}} -> канонический формат"""
+    zero_lesson = {
+        day: lesson or {}
+        for day, lesson in _ordered_days(schedule.get("zero_lesson") or {})
+    }
+
+    days = {}
+    for day, lessons in _ordered_days(schedule.get("days") or {}):
+        if isinstance(lessons, list):
+            lessons = lessons_to_dict(lessons)
+        days[day] = [
+            {"num": num, "order": lesson_rank(num), **(lesson or {})}
+            for num, lesson in sort_lessons(lessons or {}).items()
+        ]
+
+    return {"zero_lesson": zero_lesson, "days": days}
+
+
+def lessons_to_dict(lessons: list) -> dict:
+    """Хранимый массив пар -> {номер: занятие} в том же порядке"""
+    return {
+        lesson["num"]: {k: v for k, v in lesson.items() if k not in LESSON_META_FIELDS}
+        for lesson in lessons
+    }
+
+
+def from_storage(schedule: dict) -> dict:
+    """Хранимое расписание (любого формата) -> {days: {день: {номер: занятие}}}"""
+    days = {}
+    for day, lessons in (schedule.get("days") or {}).items():
+        if isinstance(lessons, list):
+            days[day] = lessons_to_dict(lessons)
+        else:
+            # старый формат: словарь в произвольном порядке
+            days[day] = sort_lessons(lessons or {})
+    return {"zero_lesson": schedule.get("zero_lesson") or {}, "days": days}
+
+
+def iter_numbered_lessons(lessons):
+    """(номер, занятие) для массива нового формата или словаря старого"""
+    if isinstance(lessons, list):
+        return ((lesson.get("num"), lesson) for lesson in lessons)
+    return lessons.items()
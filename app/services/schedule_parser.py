@@ -2,49 +2,77 @@ import os
 import re
 import json
 import asyncio
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import lru_cache
+from decouple import config
 from docx import Document
 from app.database import db
+from app.services.docx_stream import document_xml_size, iter_docx_blocks
+from app.services.schedule_store import sync_schedules
 
 SCHEDULE_FILE = "Расписание.docx"
 SHIFTS_FILE = "group_shifts.json"
 
+# "xml" — потоковый разбор word/document.xml, "docx" — эталонный python-docx
+PARSER_ENGINE = config("SCHEDULE_PARSER_ENGINE", default="xml")
+# число процессов для парсинга (0 — парсить в потоке без пула); пул есть
+# в каждом воркере uvicorn, поэтому по умолчанию он небольшой
+PARSER_WORKERS = config("SCHEDULE_PARSER_WORKERS", default=2, cast=int)
+# с какого размера word/document.xml (байт) документ делится между процессами
+PARSER_SHARD_MIN_BYTES = config("SCHEDULE_PARSER_SHARD_MIN_BYTES", default=8 * 1024 * 1024, cast=int)
+
+_parser_pool = None
+
 days_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
 
 # ============== ФУНКЦИИ ПАРСИНГА ==============
 
 
+# Все шаблоны компилируются один раз на модуль
+TEACHER_RE = re.compile(r"([А-ЯЁ][а-яё]+(?:-[А-ЯЁ][а-яё]+)?\s+[А-ЯЁ]\.[А-ЯЁ]\.?)")
+ROOM_RE = re.compile(r"\b\d{2,3}\b")
+SPACES_RE = re.compile(r"\s+")
+LESSON_NUM_RE = re.compile(r"^\d+$")
+GROUP_HEADER_RE = re.compile(r"Расписание уроков\s+для\s+(.+?)\s+группы")
+
+TEACHER_ROOM_SUFFIX_RE = re.compile(r"\s*\d{2,4}[А-Яа-я]?$")
+TEACHER_MISSING_DOT_RE = re.compile(r"([А-ЯЁ])\.([А-ЯЁ])$")
+DOUBLE_DOT_RE = re.compile(r"\.\.")
+TEACHER_JUNK_RE = re.compile(r"[^А-Яа-яЁё.\s-]")
+TEACHER_FULL_RE = re.compile(r"^[А-ЯЁ][а-яё-]+\s+[А-ЯЁ]\.[А-ЯЁ]\.?$")
+
+# размер LRU-кэша разбора текста ячеек
+CELL_CACHE_SIZE = config("SCHEDULE_CELL_CACHE_SIZE", default=8192, cast=int)
+
+# ячейки, повторно встреченные в row.cells (объединённые) и не разобранные заново
+_merged_cells_reused = 0
+
+
 def normalize_teacher_name(name: str):
     """Нормализует имя преподавателя в формат 'Фамилия И.О.'"""
     if not name:
         return None
-    name = re.sub(r"\s+", " ", name.strip())
-    m = re.search(r"([А-ЯЁ][а-яё]+(?:-[А-ЯЁ][а-яё]+)?\s+[А-ЯЁ]\.[А-ЯЁ]\.?)", name)
+    name = SPACES_RE.sub(" ", name.strip())
+    m = TEACHER_RE.search(name)
     if m:
         name = m.group(1)
-    name = re.sub(r"\s*\d{2,4}[А-Яа-я]?$", "", name)
-    name = re.sub(r"([А-ЯЁ])\.([А-ЯЁ])$", r"\1.\2.", name)
-    name = re.sub(r"\.\.", ".", name)
-    name = re.sub(r"[^А-Яа-яЁё.\s-]", "", name).strip()
-    if not re.match(r"^[А-ЯЁ][а-яё-]+\s+[А-ЯЁ]\.[А-ЯЁ]\.?$", name):
+    name = TEACHER_ROOM_SUFFIX_RE.sub("", name)
+    name = TEACHER_MISSING_DOT_RE.sub(r"\1.\2.", name)
+    name = DOUBLE_DOT_RE.sub(".", name)
+    name = TEACHER_JUNK_RE.sub("", name).strip()
+    if not TEACHER_FULL_RE.match(name):
         return None
     fam, ini = name.split(maxsplit=1)
     fam = "-".join(s[:1].upper() + s[1:].lower() for s in fam.split("-"))
     return f"{fam} {ini}"
 
 
-def parse_lesson_info_fixed(cell_text: str):
-    """
-    Парсит предмет, преподавателя и кабинет из ячейки DOCX.
-    Учитывает:
-    - МДК 07.01 ...
-    - кабинет рядом с преподавателем
-    """
-
-    if not cell_text:
-        return None
-
+@lru_cache(maxsize=CELL_CACHE_SIZE)
+def _parse_lesson_cell(cell_text: str):
+    """Разбор текста ячейки в кортеж (предмет, преподаватель, кабинет) или None"""
     # сохраняем переносы строк
     lines = [l.strip() for l in cell_text.split("\n") if l.strip()]
     text = " ".join(lines)
@@ -56,9 +84,7 @@ def parse_lesson_info_fixed(cell_text: str):
     classroom = None
 
     # --- ищем преподавателя ---
-    teacher_match = re.search(
-        r"([А-ЯЁ][а-яё]+(?:-[А-ЯЁ][а-яё]+)?\s+[А-ЯЁ]\.[А-ЯЁ]\.?)", text
-    )
+    teacher_match = TEACHER_RE.search(text)
 
     if teacher_match:
         teacher = teacher_match.group(1)
@@ -66,7 +92,7 @@ def parse_lesson_info_fixed(cell_text: str):
         # ищем кабинет рядом с преподавателем
         after_teacher = text[teacher_match.end() :]
 
-        room_match = re.search(r"\b\d{2,3}\b", after_teacher)
+        room_match = ROOM_RE.search(after_teacher)
         if room_match:
             classroom = room_match.group(0)
 
@@ -79,22 +105,60 @@ def parse_lesson_info_fixed(cell_text: str):
     if classroom:
         subject = subject.replace(classroom, "")
 
-    subject = re.sub(r"\s+", " ", subject).strip()
+    subject = SPACES_RE.sub(" ", subject).strip()
 
-    # если кабинет всё ещё внутри subject — убираем
+    # если кабинет всё ещё внутри subject — убираем (то же, что \b<кабинет>\b)
     if subject and classroom:
-        subject = re.sub(rf"\b{classroom}\b", "", subject).strip()
+        subject = ROOM_RE.sub(
+            lambda m: "" if m.group(0) == classroom else m.group(0), subject
+        ).strip()
 
     if not teacher:
         print("⚠ Не найден преподаватель:", cell_text)
 
+    return subject if subject else None, teacher, classroom
+
+
+def parse_lesson_info_fixed(cell_text: str):
+    """
+    Парсит предмет, преподавателя и кабинет из ячейки DOCX.
+    Учитывает:
+    - МДК 07.01 ...
+    - кабинет рядом с преподавателем
+    Результат разбора кэшируется по тексту ячейки, каждый вызов
+    возвращает новый dict (его потом дополняют кабинетом и временем).
+    """
+
+    if not cell_text:
+        return None
+
+    parsed = _parse_lesson_cell(cell_text)
+    if parsed is None:
+        return None
+
+    subject, teacher, classroom = parsed
     return {
-        "subject": subject if subject else None,
+        "subject": subject,
         "teacher": teacher,
         "classroom": classroom,
     }
 
 
+def parse_stats_snapshot():
+    """Накопленные в этом процессе счётчики кэша разбора ячеек"""
+    info = _parse_lesson_cell.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "merged_cells": _merged_cells_reused,
+    }
+
+
+def parse_stats_delta(before: dict, after: dict | None = None):
+    after = after or parse_stats_snapshot()
+    return {key: after[key] - before[key] for key in before}
+
+
 def add_classrooms_to_schedule(schedule: dict, group_name: str, shifts: dict):
     """
     Добавляет кабинеты из group_shifts.json,
@@ -127,7 +191,31 @@ def parse_schedule_table_fixed(table, group_name: str, schedules: dict):
     if not rows:
         return
 
-    header = [cell.text.strip() for cell in rows[0].cells]
+    # Объединённые ячейки повторяются в row.cells одним и тем же элементом:
+    # текст и разбор каждого элемента считаются один раз на таблицу
+    cell_texts = {}
+    cell_lessons = {}
+
+    def read_cells(row):
+        cells = []
+        for c in row.cells:
+            key = getattr(c, "_tc", c)
+            text = cell_texts.get(key)
+            if text is None:
+                text = cell_texts[key] = c.text.strip()
+            cells.append((key, text))
+        return cells
+
+    def lesson_for(key, text):
+        global _merged_cells_reused
+        if key in cell_lessons:
+            _merged_cells_reused += 1
+            info = cell_lessons[key]
+            return dict(info) if info else None
+        info = cell_lessons[key] = parse_lesson_info_fixed(text)
+        return info
+
+    header = [text for _, text in read_cells(rows[0])]
     if len(header) < 2:
         return
 
@@ -144,13 +232,13 @@ def parse_schedule_table_fixed(table, group_name: str, schedules: dict):
     current_lesson = None
 
     for r_idx, r in enumerate(rows[1:], 1):
-        cells = [c.text.strip() for c in r.cells]
+        cells = read_cells(r)
         if not cells:
             continue
 
-        first_cell = cells[0].strip()
+        first_cell = cells[0][1].strip()
         # Если в первой колонке стоит цифра - начинается новая пара
-        if re.match(r"^\d+$", first_cell):
+        if LESSON_NUM_RE.match(first_cell):
             current_lesson = first_cell
         elif not current_lesson:
             continue  # Пропускаем строки без номера пары в начале
@@ -166,14 +254,14 @@ def parse_schedule_table_fixed(table, group_name: str, schedules: dict):
 
         # Собираем все непустые записи для каждого дня
         for subrow_idx, cells in enumerate(rows_data):
-            for idx, text in enumerate(cells[1:], 1):
+            for idx, (cell_key, text) in enumerate(cells[1:], 1):
                 if idx not in day_columns:
                     continue
                 if not text.strip():
                     continue
 
                 day = day_columns[idx]
-                lesson_info = parse_lesson_info_fixed(text)
+                lesson_info = lesson_for(cell_key, text)
                 if not lesson_info:
                     continue
 
@@ -262,8 +350,11 @@ def parse_schedule_table_fixed(table, group_name: str, schedules: dict):
     print(f"--- [ТАБЛИЦА] Конец парсинга для группы: {group_name} ---\n")
 
 
-def parse_schedule_from_docx(file_path: str):
-    """Парсит расписание из DOCX и возвращает dict с логом"""
+def parse_schedule_from_docx_reference(file_path: str):
+    """
+    Эталонный парсер через python-docx.
+    Медленный, но служит образцом для проверки эквивалентности движка "xml".
+    """
     print(f"=== [DOCX] Открытие файла: {file_path} ===")
     doc = Document(file_path)
     schedules = {}
@@ -329,6 +420,185 @@ def parse_schedule_from_docx(file_path: str):
     return schedules
 
 
+def _empty_group_schedule():
+    return {
+        "days": {day: {} for day in days_ru},
+        "zero_lesson": {day: {} for day in days_ru},
+    }
+
+
+def iter_group_tables(file_path: str, group_names: list, blocks=None):
+    """
+    Потоково сопоставляет таблицы группам: таблица i -> i-я найденная группа,
+    как в эталоне. Генерирует пары (группа, таблица); найденные группы
+    дописываются в group_names (в том числе группы без таблиц).
+    blocks — готовый поток iter_docx_blocks(file_path) (бенчмарк замеряет его).
+    """
+    pending_tables = deque()
+    matched_tables = 0
+
+    if blocks is None:
+        blocks = iter_docx_blocks(file_path)
+
+    for kind, block in blocks:
+        if kind == "p":
+            text = block.strip()
+            if not text:
+                continue
+            group_match = GROUP_HEADER_RE.search(text)
+            if group_match:
+                current_group = group_match.group(1).strip()
+                print(f"[ГРУППА] Найдена группа '{current_group}'")
+                if current_group not in group_names:
+                    group_names.append(current_group)
+        else:
+            has_day = any(
+                day in cell.text
+                for row in block.rows
+                for cell in row.cells
+                for day in days_ru
+            )
+            if has_day:
+                pending_tables.append(block)
+
+        while pending_tables and matched_tables < len(group_names):
+            group_name = group_names[matched_tables]
+            print(f"[СОПОСТАВЛЕНИЕ] Таблица #{matched_tables} -> Группа '{group_name}'")
+            yield group_name, pending_tables.popleft()
+            matched_tables += 1
+
+    if pending_tables:
+        print(
+            f"[ОШИБКА] Таблиц больше, чем групп. Пропущено таблиц: {len(pending_tables)}"
+        )
+
+
+def parse_group_tables(group_tables):
+    """Разбирает пары (группа, таблица) в dict расписаний только этих групп"""
+    schedules = {}
+    for group_name, table in group_tables:
+        schedules[group_name] = _empty_group_schedule()
+        parse_schedule_table_fixed(table, group_name, schedules)
+    return schedules
+
+
+def parse_schedule_from_docx_stream(file_path: str):
+    """
+    Потоковый парсер: один проход по word/document.xml без python-docx.
+    Возвращает тот же dict, что и parse_schedule_from_docx_reference.
+    """
+    print(f"=== [DOCX/XML] Открытие файла: {file_path} ===")
+    group_names = []
+    parsed = parse_group_tables(iter_group_tables(file_path, group_names))
+    schedules = {g: parsed.get(g) or _empty_group_schedule() for g in group_names}
+    print(f"[DOCX/XML] Групп: {len(group_names)}, Таблиц: {len(parsed)}")
+    print("=== [DOCX/XML] Парсинг завершен ===")
+    return schedules
+
+
+PARSER_ENGINES = {
+    "xml": parse_schedule_from_docx_stream,
+    "docx": parse_schedule_from_docx_reference,
+}
+
+
+def parse_schedule_from_docx(file_path: str, engine: str | None = None):
+    """Парсит расписание из DOCX выбранным движком (по умолчанию SCHEDULE_PARSER_ENGINE)"""
+    engine = engine or PARSER_ENGINE
+    parser = PARSER_ENGINES.get(engine)
+    if parser is None:
+        raise ValueError(
+            f"Неизвестный движок парсера '{engine}', доступны: {', '.join(PARSER_ENGINES)}"
+        )
+    return parser(file_path)
+
+
+# ============== ПАРАЛЛЕЛЬНЫЙ ПАРСИНГ ==============
+
+
+def _parse_shard(file_path: str, engine: str, shard: int, shards: int):
+    """
+    Выполняется в процессе пула: сам открывает файл и разбирает каждую
+    shards-ю таблицу, начиная с shard. Через границу процессов идут только
+    путь к файлу и готовые расписания, таблицы не передаются.
+    Возвращает (все группы документа, расписания шарда, счётчики кэша).
+    """
+    stats_before = parse_stats_snapshot()
+    if engine != "xml":
+        schedules = parse_schedule_from_docx(file_path, engine)
+        return list(schedules), schedules, parse_stats_delta(stats_before)
+
+    group_names = []
+    # islice дочитывает документ до конца: group_names полный в каждом шарде
+    group_tables = itertools.islice(
+        iter_group_tables(file_path, group_names), shard, None, shards
+    )
+    schedules = parse_group_tables(group_tables)
+    return group_names, schedules, parse_stats_delta(stats_before)
+
+
+def _summarize_parse_stats(deltas: list[dict]):
+    total = {"hits": 0, "misses": 0, "merged_cells": 0}
+    for delta in deltas:
+        for key in total:
+            total[key] += delta[key]
+    lookups = total["hits"] + total["misses"]
+    total["hit_rate"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+    return total
+
+
+def get_parser_pool():
+    """Пул процессов для парсинга (создаётся лениво, None если пул отключён)"""
+    global _parser_pool
+    if _parser_pool is None and PARSER_WORKERS > 0:
+        _parser_pool = ProcessPoolExecutor(max_workers=PARSER_WORKERS)
+    return _parser_pool
+
+
+def shutdown_parser_pool():
+    global _parser_pool
+    if _parser_pool is not None:
+        _parser_pool.shutdown(wait=False, cancel_futures=True)
+        _parser_pool = None
+
+
+async def parse_schedule_async(file_path: str, engine: str | None = None):
+    """
+    Парсит DOCX вне event loop'а.
+    Документы с word/document.xml от SCHEDULE_PARSER_SHARD_MIN_BYTES делятся
+    на шарды: каждый процесс пула читает файл сам и разбирает свою долю таблиц.
+    Возвращает (schedules, stats), где stats — попадания в кэш разбора ячеек
+    и число переиспользованных объединённых ячеек за этот разбор.
+    """
+    engine = engine or PARSER_ENGINE
+    pool = get_parser_pool()
+    if pool is None:
+        stats_before = parse_stats_snapshot()
+        schedules = await asyncio.to_thread(parse_schedule_from_docx, file_path, engine)
+        return schedules, _summarize_parse_stats([parse_stats_delta(stats_before)])
+
+    shards = 1
+    if engine == "xml" and PARSER_WORKERS > 1:
+        if document_xml_size(file_path) >= PARSER_SHARD_MIN_BYTES:
+            shards = PARSER_WORKERS
+            print(f"[DOCX] Шардирование: таблицы на {shards} процессов")
+
+    loop = asyncio.get_running_loop()
+    parsed = {}
+    deltas = []
+    for group_names, shard_schedules, delta in await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, _parse_shard, file_path, engine, shard, shards)
+            for shard in range(shards)
+        )
+    ):
+        parsed.update(shard_schedules)
+        deltas.append(delta)
+
+    schedules = {g: parsed.get(g) or _empty_group_schedule() for g in group_names}
+    return schedules, _summarize_parse_stats(deltas)
+
+
 # ============== РАБОТА СО СМЕНАМИ И БД ==============
 
 
@@ -361,7 +631,7 @@ async def load_schedule_to_db():
     if not os.path.exists(SCHEDULE_FILE):
         print(f"❌ Файл {SCHEDULE_FILE} не найден")
         return
-    data = parse_schedule_from_docx(SCHEDULE_FILE)
+    data, parse_stats = await parse_schedule_async(SCHEDULE_FILE)
     if not data:
         print("❌ Не удалось распарсить расписание.")
         return
@@ -369,18 +639,27 @@ async def load_schedule_to_db():
     # Загрузка смен
     shifts = load_group_shifts()
 
-    # Очистим старые записи
-    await db.schedules.delete_many({})
+    docs = []
     for group, schedule in data.items():
         # Добавляем кабинеты из group_shifts.json
         schedule_with_classrooms = add_classrooms_to_schedule(schedule, group, shifts)
 
-        await db.schedules.insert_one(
+        docs.append(
             {
                 "group_name": group,
                 "schedule": schedule_with_classrooms,
                 "shift_info": shifts.get(group, {"shift": 1}),
-                "updated_at": datetime.now(),
             }
         )
-    print(f"✅ Залито расписание для {len(data)} групп в MongoDB")
+
+    await sync_schedules(docs)
+
+    from app.services.schedule_cache import bump_schedule_generation
+    from app.services.teacher_index import rebuild_teacher_index
+
+    await rebuild_teacher_index()
+    await bump_schedule_generation()
+    print(
+        f"✅ Залито расписание для {len(data)} групп в MongoDB "
+        f"(кэш ячеек: {parse_stats['hit_rate']:.0%} попаданий)"
+    )
@@ -1,8 +1,10 @@
+import hashlib
 from datetime import datetime
+import bson
 from fastapi import HTTPException, UploadFile
 from app.database import db
 from app.models.schedule import Schedule
-from app.models.schedule_upload import UploadResponse
+from app.models.schedule_upload import ParserCacheStats, UploadResponse
 from app.models.teacher_schedule import (
     TeacherLesson,
     TeacherScheduleResponse,
@@ -11,9 +13,24 @@ from app.models.teacher_schedule import (
 from app.services.schedule_parser import (
     add_classrooms_to_schedule,
     load_group_shifts,
-    parse_schedule_from_docx,
+    parse_schedule_async,
+)
+from app.services.bell_times import get_bell_table
+from app.services.schedule_cache import bump_schedule_generation, schedule_cache
+from app.services.schedule_format import canonical_day, from_storage, sort_lessons
+from app.services.schedule_store import rollback_schedules, sync_schedules
+from app.services.teacher_index import (
+    find_teacher_lessons,
+    rebuild_teacher_index,
+    remove_group_from_teacher_index,
+)
+from app.services.teacher_search import (
+    find_teacher_keys,
+    get_teacher_search_index,
+    search_teachers,
 )
 from app.utils.common import normalize_day_name, normalize_name, serialize_doc
+from app.utils.http_cache import latest, make_etag
 
 
 class ScheduleService:
@@ -22,26 +39,146 @@ class ScheduleService:
         """Сортирует пары по номерам: 1, 2, 2.1, 2.2, 3, 4, 4.1, 4.2"""
         if not lessons:
             return lessons
-
-        def parse_key(key):
-            # "4" → (4, 0)
-            # "4.2" → (4, 2)
-            try:
-                if "." in key:
-                    parts = key.split(".")
-                    return int(parts[0]), int(parts[1])
-                return int(key), 0
-            except (ValueError, IndexError):
-                # Если ключ не число (на всякий случай), отправляем в конец
-                return 999, 0
-
-        sorted_keys = sorted(lessons.keys(), key=parse_key)
-        return {k: lessons[k] for k in sorted_keys}
+        return sort_lessons(lessons)
 
     @staticmethod
     async def get_all_schedules():
         schedules = await db.schedules.find().to_list(100)
-        return [Schedule(**serialize_doc(s)) for s in schedules]
+        bells = await get_bell_table()
+        result = []
+        for s in schedules:
+            s = serialize_doc(s)
+            s["schedule"] = bells.apply(
+                from_storage(s.get("schedule") or {}),
+                (s.get("shift_info") or {}).get("shift", 1),
+            )
+            result.append(Schedule(**s))
+        return result
+
+    @staticmethod
+    async def get_group_snapshot(group_name: str):
+        """
+        Снимок расписания группы из кэша процесса (при промахе — из MongoDB).
+        Пары хранятся уже отсортированными, время по звонкам проставлено,
+        полная модель Schedule собрана заранее.
+        Возвращает {"doc": ..., "model": Schedule, "etag": ..., "last_modified": ...}
+        или None; last_modified учитывает и документ группы, и звонки.
+        """
+
+        async def load():
+            schedule = await db.schedules.find_one({"group_name": group_name})
+            if not schedule:
+                return None
+            raw = bson.encode(schedule)
+            bells = await get_bell_table()
+            # ETag от содержимого документа и версии звонков
+            etag = make_etag(hashlib.sha1(raw).hexdigest(), bells.version)
+
+            schedule = serialize_doc(schedule)
+            full_schedule = bells.apply(
+                from_storage(schedule.get("schedule") or {}),
+                (schedule.get("shift_info") or {}).get("shift", 1),
+            )
+            schedule["schedule"] = full_schedule
+
+            model = Schedule(
+                group_name=group_name,
+                shift_info=schedule.get("shift_info", {}),
+                updated_at=schedule.get("updated_at"),
+                schedule=full_schedule,
+            )
+            last_modified = latest(schedule.get("updated_at"), bells.updated_at)
+            snapshot = {
+                "doc": schedule,
+                "model": model,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            return snapshot, len(raw)
+
+        return await schedule_cache.get_or_load(group_name, load)
+
+    @staticmethod
+    async def get_group_day_snapshot(group_name: str, day: str):
+        """
+        Снимок одного дня группы: из MongoDB читаются только
+        schedule.days.<день>, schedule.zero_lesson.<день>, shift_info и updated_at.
+        Возвращает {"doc": ..., "day": канонический день или None, "etag": ...,
+        "last_modified": ...} или None, если группы нет.
+        """
+        dname = canonical_day(day)
+        projection = {"shift_info": 1, "updated_at": 1}
+        if dname:
+            projection[f"schedule.days.{dname}"] = 1
+            projection[f"schedule.zero_lesson.{dname}"] = 1
+
+        async def load():
+            schedule = await db.schedules.find_one(
+                {"group_name": group_name}, projection
+            )
+            if schedule is None:
+                return None
+            raw = bson.encode(schedule)
+            bells = await get_bell_table()
+            etag = make_etag(hashlib.sha1(raw).hexdigest(), dname, bells.version)
+
+            schedule = serialize_doc(schedule)
+            schedule["schedule"] = bells.apply(
+                from_storage(schedule.get("schedule") or {}),
+                (schedule.get("shift_info") or {}).get("shift", 1),
+            )
+            last_modified = latest(schedule.get("updated_at"), bells.updated_at)
+            snapshot = {
+                "doc": schedule,
+                "day": dname,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            return snapshot, len(raw)
+
+        return await schedule_cache.get_or_load((group_name, dname), load)
+
+    @staticmethod
+    def lesson_days(model: Schedule) -> list[str]:
+        """Дни расписания группы, в которые есть пары (в т.ч. только нулевая)"""
+        zero = model.schedule.zero_lesson
+        return [
+            day
+            for day, lessons in model.schedule.days.items()
+            if lessons or (day in zero and zero[day].subject)
+        ]
+
+    @staticmethod
+    async def resolve_group_snapshot(group_name: str, day: str | None):
+        """Снимок для ответа get_schedule_by_group: всей группы или одного дня"""
+        if not day:
+            return await ScheduleService.get_group_snapshot(group_name)
+        # читаем из MongoDB только нужный день
+        return await ScheduleService.get_group_day_snapshot(group_name, day)
+
+    @staticmethod
+    def group_validators(snapshot, day: str | None):
+        """
+        (ETag, Last-Modified) ответа по снимку resolve_group_snapshot или None.
+        Last-Modified — позднейшее из изменения группы и загрузки звонков:
+        время пар накладывается при чтении и updated_at группы не меняет.
+        """
+        if not snapshot:
+            return None
+        if day:
+            # в ответе есть исходная строка дня
+            return make_etag(snapshot["etag"], day), snapshot["last_modified"]
+        return snapshot["etag"], snapshot["last_modified"]
+
+    @staticmethod
+    async def get_generation_validators(*parts):
+        """
+        (ETag, Last-Modified) для ответов, собранных из всех расписаний:
+        версия — текущее поколение расписания.
+        """
+        await schedule_cache.sync_generation()
+        etag = make_etag(*parts, schedule_cache.generation)
+        return etag, schedule_cache.generation_updated_at
 
     @staticmethod
     async def get_schedule_by_group(group_name: str, day: str | None):
@@ -51,49 +188,35 @@ class ScheduleService:
         - 404: группа не найдена;
         - 204/404: группа есть, но в этот день нет пар.
         """
-        schedule = await db.schedules.find_one({"group_name": group_name})
-        if not schedule:
+        snapshot = await ScheduleService.resolve_group_snapshot(group_name, day)
+        return ScheduleService.group_schedule_from_snapshot(group_name, day, snapshot)
+
+    @staticmethod
+    def group_schedule_from_snapshot(group_name: str, day: str | None, snapshot):
+        """Ответ get_schedule_by_group по уже полученному снимку (None — 404)"""
+        if not snapshot:
             raise HTTPException(
                 status_code=404, detail=f"Группа '{group_name}' не найдена"
             )
 
-        schedule = serialize_doc(schedule)
-        shift_info = schedule.get("shift_info", {})
-
         if not day:
-            # Если день не указан, возвращаем всё расписание (тоже отсортированное)
-            full_schedule = schedule.get("schedule", {})
-            # Сортируем дни внутри расписания
-            if "days" in full_schedule:
-                sorted_days = {}
-                for dname, lessons in full_schedule["days"].items():
-                    sorted_days[dname] = ScheduleService.sort_lessons_by_number(lessons)
-                full_schedule["days"] = sorted_days
-
-            return Schedule(
-                group_name=group_name,
-                shift_info=shift_info,
-                updated_at=schedule.get("updated_at"),
-                schedule=full_schedule,
-            )
+            # Если день не указан, возвращаем всё расписание (уже отсортированное)
+            return snapshot["model"]
 
-        normalized_day = normalize_day_name(day)
+        schedule = snapshot["doc"]
+        shift_info = schedule.get("shift_info", {})
         schedule_data = schedule.get("schedule", {})
         filtered_schedule = {}
 
-        # фильтрация
+        # дни хранятся под каноническими ключами — прямой доступ по ключу
+        dname = snapshot["day"]
         zero = schedule_data.get("zero_lesson", {})
-        for dname, info in zero.items():
-            if normalize_day_name(dname) == normalized_day:
-                filtered_schedule["zero_lesson"] = {dname: info}
+        if dname in zero:
+            filtered_schedule["zero_lesson"] = {dname: zero[dname]}
 
         days = schedule_data.get("days", {})
-        for dname, lessons in days.items():
-            if normalize_day_name(dname) == normalized_day:
-                # === ИСПРАВЛЕНИЕ: Сортируем пары перед возвратом ===
-                sorted_lessons = ScheduleService.sort_lessons_by_number(lessons)
-                filtered_schedule["days"] = {dname: sorted_lessons}
-                break
+        if dname in days:
+            filtered_schedule["days"] = {dname: days[dname]}
 
         # ❗ Если группа есть, но в этот день нет пар
         if not filtered_schedule:
@@ -110,6 +233,10 @@ class ScheduleService:
             "updated_at": schedule.get("updated_at"),
         }
 
+    @staticmethod
+    def get_cache_stats():
+        return schedule_cache.stats()
+
     @staticmethod
     async def upload_schedule(
         schedule_file: UploadFile, shifts_file: UploadFile | None
@@ -117,7 +244,8 @@ class ScheduleService:
         """
         Загружает файл .docx, парсит его и сохраняет расписания в MongoDB.
         Если передан также файл group_shifts.json — он обновляется вместе с расписанием.
-        Старые записи полностью очищаются.
+        Записываются только группы, чьё расписание изменилось (по content_hash);
+        предыдущая версия остаётся доступной для отката.
         """
         import os, json
 
@@ -146,8 +274,8 @@ class ScheduleService:
                     json.dump(new_shifts, f, ensure_ascii=False, indent=2)
                 print(f"✅ Обновлён файл group_shifts.json ({len(new_shifts)} групп)")
 
-            # парсим документ
-            data = parse_schedule_from_docx(temp_docx)
+            # парсим документ в пуле процессов, не блокируя event loop
+            data, parse_stats = await parse_schedule_async(temp_docx)
             if not data:
                 raise HTTPException(
                     status_code=400, detail="Не удалось распарсить расписание"
@@ -156,10 +284,7 @@ class ScheduleService:
             # загружаем смены (уже обновлённые)
             shifts = load_group_shifts()
 
-            # очищаем старое расписание
-            await db.schedules.delete_many({})
-
-            inserted = []
+            docs = []
             first_shift_count = 0
             second_shift_count = 0
 
@@ -176,24 +301,35 @@ class ScheduleService:
                     schedule, group, shifts
                 )
 
-                doc = {
-                    "group_name": group,
-                    "schedule": schedule_with_classrooms,
-                    "shift_info": shift_info,
-                    "updated_at": datetime.now(),
-                }
-                result = await db.schedules.insert_one(doc)
-                inserted.append(str(result.inserted_id))
+                docs.append(
+                    {
+                        "group_name": group,
+                        "schedule": schedule_with_classrooms,
+                        "shift_info": shift_info,
+                    }
+                )
+
+            # пишем только добавленные, изменённые и удалённые группы
+            sync = await sync_schedules(docs)
+            await rebuild_teacher_index()
+            await bump_schedule_generation()
 
             return UploadResponse(
                 message=(
-                    f"✅ Расписание загружено для {len(inserted)} групп "
-                    f"({first_shift_count} — 1 смена, {second_shift_count} — 2 смена)"
+                    f"✅ Расписание загружено для {len(docs)} групп "
+                    f"({first_shift_count} — 1 смена, {second_shift_count} — 2 смена); "
+                    f"новых: {sync['added']}, изменено: {sync['changed']}, "
+                    f"без изменений: {sync['unchanged']}, удалено: {sync['removed']}"
                 ),
-                inserted_ids=inserted,
-                total_groups=len(inserted),
+                inserted_ids=sync["inserted_ids"],
+                total_groups=len(docs),
                 first_shift=first_shift_count,
                 second_shift=second_shift_count,
+                added=sync["added"],
+                changed=sync["changed"],
+                unchanged=sync["unchanged"],
+                removed=sync["removed"],
+                parser_cache=ParserCacheStats(**parse_stats),
             )
 
         except Exception as e:
@@ -206,17 +342,46 @@ class ScheduleService:
                 if path and os.path.exists(path):
                     os.remove(path)
 
+    @staticmethod
+    async def rollback_schedule():
+        if not await rollback_schedules():
+            raise HTTPException(
+                status_code=404, detail="Нет предыдущей версии расписания для отката"
+            )
+        await rebuild_teacher_index()
+        await bump_schedule_generation()
+        return {"message": "Расписание откачено к предыдущей версии"}
+
     @staticmethod
     async def delete_schedule(group_name: str):
         result = await db.schedules.delete_one({"group_name": group_name})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Schedule not found")
+        await remove_group_from_teacher_index(group_name)
+        await bump_schedule_generation()
         return {"message": f"Schedule for '{group_name}' deleted"}
 
     @staticmethod
-    async def get_teacher_schedule(fio: str, day: str | None):
+    async def search_teachers(query: str, limit: int):
+        return await search_teachers(query, limit)
+
+    @staticmethod
+    async def resolve_teacher_keys(fio: str, key: str | None = None) -> list[str]:
+        """
+        Ключи индекса преподавателей, к которым сводится введённое ФИО
+        (или key из поиска, если он есть в индексе)
+        """
+        if key:
+            search_index = await get_teacher_search_index()
+            return [key] if key in search_index.by_key else []
+        return await find_teacher_keys(normalize_name(fio.strip()))
+
+    @staticmethod
+    async def get_teacher_schedule(fio: str, day: str | None, key: str | None = None):
         """
         Гибкий поиск расписания преподавателя.
+        key — канонический ключ из поиска преподавателей: с ним ФИО
+        не сопоставляется с другими именами.
         Теперь возвращает разные ошибки:
         - 404: преподаватель не найден вообще;
         - 204: преподаватель найден, но в указанный день у него нет пар.
@@ -227,89 +392,32 @@ class ScheduleService:
                 status_code=400, detail="Некорректное ФИО преподавателя"
             )
 
-        fio_normalized = normalize_name(fio)
         normalized_day = normalize_day_name(day) if day else None
 
-        schedules = await db.schedules.find().to_list(1000)
+        # один запрос по индексу teacher_lessons вместо обхода всех групп
+        teacher_keys = await ScheduleService.resolve_teacher_keys(fio, key)
+        teacher_found_anywhere = bool(teacher_keys)
+        lessons = (
+            await find_teacher_lessons(teacher_keys, normalized_day)
+            if teacher_keys
+            else []
+        )
 
-        teacher_found_anywhere = False
+        bells = await get_bell_table()
         first_shift: dict[str, dict] = {}
         second_shift: dict[str, dict] = {}
 
-        def coerce_shift(v):
-            if v is None or v == "":
-                return None
-            try:
-                return int(v)
-            except (TypeError, ValueError):
-                return None
-
-        def pick_shift_target(raw_shift_value):
-            shift_value = coerce_shift(raw_shift_value)
-
-            if shift_value == 0:
-                return None  # скрытая группа
-
-            if shift_value is None:
-                shift_value = 1  # дефолт — 1-я смена
-
-            if shift_value == 1:
-                return first_shift
-            if shift_value == 2:
-                return second_shift
-
-            return None
-
-        # --- Поиск занятий преподавателя с учетом смен ---
-        for s in schedules:
-            group_name = s.get("group_name")
-            schedule_data = s.get("schedule", {})
-            if not schedule_data:
-                continue
-
-            raw_shift = (s.get("shift_info") or {}).get("shift", 1)
-            shift_target = pick_shift_target(raw_shift)
-            if shift_target is None:
-                continue
-
-            def match_teacher(teacher: str) -> bool:
-                if not teacher:
-                    return False
-                t_norm = normalize_name(teacher)
-                return fio_normalized in t_norm or t_norm in fio_normalized
-
-            # нулевая пара
-            for day_name, zero in (schedule_data.get("zero_lesson") or {}).items():
-                if zero and match_teacher(zero.get("teacher", "")):
-                    teacher_found_anywhere = True
-                    if (
-                        not normalized_day
-                        or normalize_day_name(day_name) == normalized_day
-                    ):
-                        shift_target.setdefault(day_name, {})
-                        shift_target[day_name]["0"] = TeacherLesson(
-                            subject=zero.get("subject", ""),
-                            group=group_name,
-                            classroom=zero.get("classroom", ""),
-                            time=zero.get("time"),
-                        )
-
-            # обычные пары
-            for day_name, lessons in (schedule_data.get("days") or {}).items():
-                for num, info in (lessons or {}).items():
-                    if info and match_teacher(info.get("teacher", "")):
-                        teacher_found_anywhere = True
-                        if (
-                            not normalized_day
-                            or normalize_day_name(day_name) == normalized_day
-                        ):
-                            shift_target.setdefault(day_name, {})
-                            shift_target[day_name][num] = TeacherLesson(
-                                subject=info.get("subject", ""),
-                                group=group_name,
-                                classroom=info.get("classroom", ""),
-                                time=info.get("time"),
-                            )
+        for lesson in lessons:
+            shift_target = first_shift if lesson["shift"] == 1 else second_shift
+            shift_target.setdefault(lesson["day"], {})
+            shift_target[lesson["day"]][lesson["lesson_num"]] = TeacherLesson(
+                subject=lesson["subject"],
+                group=lesson["group_name"],
+                classroom=lesson["classroom"],
+                time=bells.time_for(
+                    lesson["day"], lesson["shift"], lesson["lesson_num"]
+                ),
+            )
 
         if not teacher_found_anywhere:
             raise HTTPException(
@@ -327,17 +435,7 @@ class ScheduleService:
                 detail=f"У преподавателя '{fio}' нет пар в день '{day}'",
             )
 
-        # === ИСПРАВЛЕНИЕ: Сортируем пары в расписании преподавателя ===
-        for day_name in first_shift:
-            first_shift[day_name] = ScheduleService.sort_lessons_by_number(
-                first_shift[day_name]
-            )
-
-        for day_name in second_shift:
-            second_shift[day_name] = ScheduleService.sort_lessons_by_number(
-                second_shift[day_name]
-            )
-
+        # пары приходят из индекса уже в порядке недели и номеров
         return TeacherScheduleResponse(
             teacher_fio=fio,
             filtered_by_day=day if day else None,
@@ -0,0 +1,281 @@
+"""
+Запись расписаний в MongoDB.
+
+Каждый документ группы хранит content_hash своего расписания. При повторной
+загрузке пишутся только добавленные, изменённые и удалённые группы.
+Если меняется большая часть групп, новое расписание пишется пачками
+в промежуточную коллекцию, индексируется и подменяет рабочую одним
+renameCollection с dropTarget, так что читатели не видят пустую или
+наполовину залитую коллекцию, а рабочая коллекция существует всегда.
+Прошлая версия сохраняется в schedules_previous до изменения рабочей
+коллекции и остаётся для отката на один шаг; в неё тоже переписываются
+только группы, разошедшиеся с рабочей коллекцией.
+Расписание хранится в каноническом формате (см. schedule_format).
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
+from decouple import config
+from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateOne
+from app.database import db
+from app.indexes import create_collection_indexes
+from app.services.schedule_format import FORMAT_VERSION, to_storage
+
+SCHEDULES_COLLECTION = "schedules"
+STAGING_COLLECTION = "schedules_staging"
+PREVIOUS_COLLECTION = "schedules_previous"
+ROLLBACK_TMP_COLLECTION = "schedules_rollback_tmp"
+
+INSERT_BATCH_SIZE = config("SCHEDULE_INSERT_BATCH_SIZE", default=500, cast=int)
+# доля изменённых групп, начиная с которой коллекция подменяется целиком
+FULL_SWAP_RATIO = config("SCHEDULE_FULL_SWAP_RATIO", default=0.5, cast=float)
+
+# в пределах процесса подмены коллекций идут строго по очереди
+_swap_lock = asyncio.Lock()
+
+
+async def _copy_collection(source: str, target: str) -> bool:
+    """Копирует source в target ($out заменяет target целиком). False — нет source."""
+    if source not in await db.list_collection_names():
+        return False
+    await db[source].aggregate([{"$out": target}]).to_list(None)
+    return True
+
+
+async def _save_previous():
+    """
+    Приводит schedules_previous к текущей рабочей коллекции перед её изменением.
+    Сравниваются только group_name и content_hash: переписываются группы,
+    изменённые или удалённые с прошлой загрузки, а не вся коллекция.
+    """
+    names = await db.list_collection_names()
+    if PREVIOUS_COLLECTION not in names:
+        await _copy_collection(SCHEDULES_COLLECTION, PREVIOUS_COLLECTION)
+        return
+
+    projection = {"_id": 0, "group_name": 1, "content_hash": 1}
+    saved = {
+        d["group_name"]: d.get("content_hash")
+        async for d in db[PREVIOUS_COLLECTION].find({}, projection)
+    }
+    live = {
+        d["group_name"]: d.get("content_hash")
+        async for d in db[SCHEDULES_COLLECTION].find({}, projection)
+    }
+    stale = [g for g, h in live.items() if h is None or saved.get(g) != h]
+    gone = [g for g in saved if g not in live]
+    if not stale and not gone:
+        return
+
+    # удаление + вставка, а не ReplaceOne: _id в копии совпадает с рабочим
+    await db[PREVIOUS_COLLECTION].delete_many({"group_name": {"$in": stale + gone}})
+    ops = [
+        InsertOne(doc)
+        async for doc in db[SCHEDULES_COLLECTION].find({"group_name": {"$in": stale}})
+    ]
+    for i in range(0, len(ops), INSERT_BATCH_SIZE):
+        await db[PREVIOUS_COLLECTION].bulk_write(
+            ops[i : i + INSERT_BATCH_SIZE], ordered=False
+        )
+
+
+async def _replace_live(source: str):
+    """
+    Подменяет рабочую коллекцию на source одной командой renameCollection:
+    schedules не пропадает ни на миг, и при ошибке остаётся прежней.
+    """
+    # $out копирует только данные — индексы строятся до подмены
+    # (на пустом staging заодно создаётся сама коллекция)
+    await create_collection_indexes(db[source], SCHEDULES_COLLECTION)
+    await db[source].rename(SCHEDULES_COLLECTION, dropTarget=True)
+
+
+def schedule_content_hash(schedule: dict, shift_info: dict | None) -> str:
+    """Стабильный хеш расписания группы (не зависит от порядка ключей)"""
+    payload = json.dumps(
+        {"schedule": schedule, "shift_info": shift_info or {}},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _replace_all(docs: list[dict]) -> list[str]:
+    """
+    Атомарно заменяет все расписания на docs (вызывается под _swap_lock).
+    Возвращает id вставленных документов.
+    """
+    staging = db[STAGING_COLLECTION]
+    await staging.drop()
+
+    inserted_ids = []
+    for i in range(0, len(docs), INSERT_BATCH_SIZE):
+        result = await staging.insert_many(
+            docs[i : i + INSERT_BATCH_SIZE], ordered=False
+        )
+        inserted_ids.extend(str(_id) for _id in result.inserted_ids)
+
+    # копия для отката — до подмены, рабочая коллекция пока не тронута
+    await _save_previous()
+    await _replace_live(STAGING_COLLECTION)
+    print(f"✅ Коллекция расписаний заменена ({len(inserted_ids)} групп)")
+    return inserted_ids
+
+
+async def sync_schedules(docs: list[dict]) -> dict:
+    """
+    Приводит коллекцию расписаний к docs, записывая только изменения.
+    Документам проставляются content_hash, канонический формат schedule
+    и (только изменённым) updated_at.
+    Возвращает inserted_ids новых групп и счётчики added/changed/unchanged/removed.
+    """
+    now = datetime.now(timezone.utc)
+    for doc in docs:
+        doc["content_hash"] = schedule_content_hash(
+            doc["schedule"], doc.get("shift_info")
+        )
+        # храним в каноническом виде: чтение обходится без сортировки
+        doc["schedule"] = to_storage(doc["schedule"])
+        doc["format_version"] = FORMAT_VERSION
+
+    async with _swap_lock:
+        existing = {
+            d["group_name"]: d.get("content_hash")
+            async for d in db[SCHEDULES_COLLECTION].find(
+                {}, {"_id": 0, "group_name": 1, "content_hash": 1}
+            )
+        }
+        new_names = {d["group_name"] for d in docs}
+
+        written = []
+        unchanged = []
+        added_count = 0
+        for doc in docs:
+            group_name = doc["group_name"]
+            if group_name not in existing:
+                added_count += 1
+            elif existing[group_name] == doc["content_hash"]:
+                unchanged.append(group_name)
+                continue
+            doc["updated_at"] = now
+            written.append(doc)
+        removed = [g for g in existing if g not in new_names]
+
+        stats = {
+            "inserted_ids": [],
+            "added": added_count,
+            "changed": len(written) - added_count,
+            "unchanged": len(unchanged),
+            "removed": len(removed),
+        }
+        if not written and not removed:
+            print(f"✅ Расписание не изменилось ({len(unchanged)} групп)")
+            return stats
+
+        if len(written) + len(removed) >= FULL_SWAP_RATIO * max(len(existing), 1):
+            # неизменённые группы переносятся как есть, со своим updated_at
+            kept = {
+                d["group_name"]: d
+                async for d in db[SCHEDULES_COLLECTION].find(
+                    {"group_name": {"$in": unchanged}}
+                )
+            }
+            full_docs = [kept.get(d["group_name"], d) for d in docs]
+            inserted_ids = await _replace_all(full_docs)
+            stats["inserted_ids"] = [
+                _id
+                for _id, doc in zip(inserted_ids, full_docs)
+                if doc["group_name"] not in existing
+            ]
+            return stats
+
+        # точечное обновление: версия для отката + один bulk_write
+        await _save_previous()
+        ops = [
+            ReplaceOne({"group_name": d["group_name"]}, d, upsert=True) for d in written
+        ]
+        if removed:
+            ops.append(DeleteMany({"group_name": {"$in": removed}}))
+        result = await db[SCHEDULES_COLLECTION].bulk_write(ops, ordered=False)
+        stats["inserted_ids"] = [str(_id) for _id in result.upserted_ids.values()]
+
+    print(
+        f"✅ Расписание обновлено: +{stats['added']} ~{stats['changed']} "
+        f"-{stats['removed']} (без изменений {stats['unchanged']})"
+    )
+    return stats
+
+
+async def rollback_schedules() -> bool:
+    """
+    Меняет местами текущее и предыдущее расписание.
+    Повторный вызов возвращает всё обратно. False — откатываться некуда.
+    """
+    async with _swap_lock:
+        names = await db.list_collection_names()
+        if PREVIOUS_COLLECTION not in names:
+            return False
+
+        # текущая версия копируется заранее: рабочая коллекция подменяется
+        # одним rename, а если он не пройдёт — копия просто удаляется
+        copied = await _copy_collection(SCHEDULES_COLLECTION, ROLLBACK_TMP_COLLECTION)
+        try:
+            await _replace_live(PREVIOUS_COLLECTION)
+        except Exception:
+            await db[ROLLBACK_TMP_COLLECTION].drop()
+            raise
+        if copied:
+            await db[ROLLBACK_TMP_COLLECTION].rename(
+                PREVIOUS_COLLECTION, dropTarget=True
+            )
+
+    print("↩️ Расписание откачено к предыдущей версии")
+    return True
+
+
+async def migrate_schedules_to_canonical() -> int:
+    """
+    Переводит документы старого формата (schedules и schedules_previous)
+    в канонический. Возвращает число изменённых документов рабочей коллекции.
+    """
+    migrated = 0
+    for name in (SCHEDULES_COLLECTION, PREVIOUS_COLLECTION):
+        ops = [
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {
+                    "$set": {
+                        "schedule": to_storage(doc.get("schedule") or {}),
+                        "format_version": FORMAT_VERSION,
+                    }
+                },
+            )
+            async for doc in db[name].find(
+                {"format_version": {"$ne": FORMAT_VERSION}}, {"schedule": 1}
+            )
+        ]
+        for i in range(0, len(ops), INSERT_BATCH_SIZE):
+            await db[name].bulk_write(ops[i : i + INSERT_BATCH_SIZE], ordered=False)
+        if name == SCHEDULES_COLLECTION:
+            migrated = len(ops)
+
+    if migrated:
+        print(f"✅ Переведено в канонический формат: {migrated} расписаний")
+    return migrated
+
+
+if __name__ == "__main__":
+    # Ручной запуск миграции: python -m app.services.schedule_store
+    from app.services.schedule_cache import bump_schedule_generation
+    from app.services.teacher_index import rebuild_teacher_index
+
+    async def _migrate():
+        if await migrate_schedules_to_canonical():
+            await rebuild_teacher_index()
+            await bump_schedule_generation()
+
+    asyncio.run(_migrate())
@@ -0,0 +1,144 @@
+"""
+Индекс занятий преподавателей (коллекция teacher_lessons).
+
+Строится из коллекции schedules после загрузки расписания и обновления
+звонков: по документу на каждое занятие с каноническим ключом
+преподавателя, так что поиск расписания преподавателя — один запрос
+по индексу (teacher_key, day_key) вместо обхода всех групп. Занятия
+отдаются уже в порядке недели и номеров пар (day_index, order).
+"""
+
+import asyncio
+from app.database import db
+from app.indexes import create_collection_indexes
+from app.services.schedule_format import DAY_INDEX, from_storage, lesson_rank
+from app.services.schedule_parser import normalize_teacher_name
+from app.utils.common import normalize_day_name, normalize_name
+
+TEACHER_LESSONS_COLLECTION = "teacher_lessons"
+TEACHER_LESSONS_STAGING = "teacher_lessons_staging"
+
+INSERT_BATCH_SIZE = 1000
+
+# поля занятия, нужные ответу get_teacher_schedule
+TEACHER_LESSON_PROJECTION = {
+    "_id": 0,
+    "shift": 1,
+    "day": 1,
+    "lesson_num": 1,
+    "group_name": 1,
+    "subject": 1,
+    "classroom": 1,
+}
+
+_rebuild_lock = asyncio.Lock()
+
+
+def teacher_key(teacher: str) -> str:
+    """Канонический ключ преподавателя: 'Иванов И.И.' -> 'ивановии'"""
+    return normalize_name(normalize_teacher_name(teacher) or teacher)
+
+
+def resolve_shift(raw_shift_value):
+    """
+    Смена группы для расписания преподавателя: 1, 2 или None (группа скрыта).
+    Пустое или нечисловое значение считается 1-й сменой.
+    """
+    if raw_shift_value is None or raw_shift_value == "":
+        shift_value = None
+    else:
+        try:
+            shift_value = int(raw_shift_value)
+        except (TypeError, ValueError):
+            shift_value = None
+
+    if shift_value is None:
+        return 1
+    if shift_value in (1, 2):
+        return shift_value
+    return None  # 0 — скрытая группа, прочие значения тоже не показываем
+
+
+def _lesson_doc(seq, group_name, shift, day_name, num, info):
+    return {
+        "teacher_key": teacher_key(info["teacher"]),
+        "teacher": info["teacher"],
+        "group_name": group_name,
+        "shift": shift,
+        "day": day_name,
+        "day_key": normalize_day_name(day_name),
+        "day_index": DAY_INDEX.get(day_name, len(DAY_INDEX)),
+        "lesson_num": num,
+        "order": lesson_rank(num),
+        "subject": info.get("subject", ""),
+        "classroom": info.get("classroom", ""),
+        # порядок обхода расписаний: при совпадении номера пары
+        # более поздняя группа перекрывает более раннюю
+        "seq": seq,
+    }
+
+
+def build_teacher_lessons(schedule_docs):
+    """Документы teacher_lessons для списка документов расписаний"""
+    lessons = []
+    for s in schedule_docs:
+        group_name = s.get("group_name")
+        if not s.get("schedule"):
+            continue
+        schedule_data = from_storage(s["schedule"])
+
+        shift = resolve_shift((s.get("shift_info") or {}).get("shift", 1))
+        if shift is None:
+            continue
+
+        for day_name, zero in (schedule_data.get("zero_lesson") or {}).items():
+            if zero and zero.get("teacher"):
+                lessons.append(
+                    _lesson_doc(len(lessons), group_name, shift, day_name, "0", zero)
+                )
+
+        for day_name, day_lessons in (schedule_data.get("days") or {}).items():
+            for num, info in (day_lessons or {}).items():
+                if info and info.get("teacher"):
+                    lessons.append(
+                        _lesson_doc(
+                            len(lessons), group_name, shift, day_name, num, info
+                        )
+                    )
+    return lessons
+
+
+async def rebuild_teacher_index():
+    """Пересобирает teacher_lessons в staging и подменяет коллекцию"""
+    async with _rebuild_lock:
+        schedules = await db.schedules.find(
+            {}, {"group_name": 1, "schedule": 1, "shift_info": 1}
+        ).to_list(None)
+        lessons = build_teacher_lessons(schedules)
+
+        staging = db[TEACHER_LESSONS_STAGING]
+        await staging.drop()
+        for i in range(0, len(lessons), INSERT_BATCH_SIZE):
+            await staging.insert_many(lessons[i : i + INSERT_BATCH_SIZE], ordered=False)
+        await create_collection_indexes(staging, TEACHER_LESSONS_COLLECTION)
+        await staging.rename(TEACHER_LESSONS_COLLECTION, dropTarget=True)
+
+    print(f"✅ Индекс преподавателей: {len(lessons)} занятий")
+    return len(lessons)
+
+
+async def remove_group_from_teacher_index(group_name: str):
+    await db[TEACHER_LESSONS_COLLECTION].delete_many({"group_name": group_name})
+
+
+async def find_teacher_lessons(keys: list[str], day_key: str | None):
+    """
+    Занятия преподавателей по дням недели и номерам пар; при совпадении
+    номера — в порядке построения индекса.
+    """
+    query = {"teacher_key": {"$in": keys}}
+    if day_key:
+        query["day_key"] = day_key
+    cursor = db[TEACHER_LESSONS_COLLECTION].find(query, TEACHER_LESSON_PROJECTION)
+    cursor = cursor.sort([("day_index", 1), ("order", 1), ("seq", 1)])
+    return await cursor.to_list(None)
@@ -0,0 +1,175 @@
+"""
+Автодополнение и нечёткий поиск преподавателей.
+
+Индекс строится в памяти процесса из teacher_lessons один раз на поколение
+расписания: префиксное дерево по каноническим ключам ('ивановии') для ввода
+с начала фамилии и триграммы для опечаток и неполного ввода. Результат —
+ранжированный список кандидатов с ключом, который можно передать
+в расписание преподавателя вместо ФИО.
+"""
+
+import asyncio
+from app.database import db
+from app.services.schedule_cache import schedule_cache
+from app.services.schedule_parser import normalize_teacher_name
+from app.services.teacher_index import TEACHER_LESSONS_COLLECTION, teacher_key
+
+# минимальная доля общих триграмм для нечёткого совпадения
+MIN_TRIGRAM_SCORE = 0.3
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []  # все ключи с этим префиксом
+
+
+class TeacherSearchIndex:
+    """Префиксное дерево + триграммы по каноническим ключам преподавателей"""
+
+    def __init__(self, teachers: list[dict]):
+        # teachers: [{"key", "name", "lessons"}], самые частые — первыми
+        self.teachers = sorted(teachers, key=lambda t: (-t["lessons"], t["key"]))
+        self.by_key = {t["key"]: t for t in self.teachers}
+        self.root = _TrieNode()
+        self.grams = {}
+        self.gram_counts = []
+
+        for idx, teacher in enumerate(self.teachers):
+            node = self.root
+            for ch in teacher["key"]:
+                node = node.children.setdefault(ch, _TrieNode())
+                node.ids.append(idx)
+            grams = trigrams(teacher["key"])
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.grams.setdefault(gram, []).append(idx)
+
+    def _prefix_ids(self, prefix: str) -> list[int]:
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.ids
+
+    def resolve(self, key: str) -> list[str]:
+        """
+        Ключи для расписания по введённому ФИО (уже нормализованному):
+        точный ключ, иначе все ключи с этим началом ('иванов' — и Иванов,
+        и Иванова), иначе ключи, которыми начинается ввод (ФИО полнее ключа).
+        """
+        if not key:
+            return []
+        if key in self.by_key:
+            return [key]
+        ids = self._prefix_ids(key)
+        if ids:
+            return [self.teachers[idx]["key"] for idx in ids]
+        found = []
+        for end in range(1, len(key)):
+            if key[:end] in self.by_key:
+                found.append(key[:end])
+        return found
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """
+        Кандидаты по убыванию score: точное совпадение ключа (1.0),
+        начало ключа (0.8–0.9, чем полнее ввод — тем выше), затем триграммы.
+        """
+        key = teacher_key(query)
+        if not key or limit <= 0:
+            return []
+
+        scores = {}
+        for idx in self._prefix_ids(key):
+            full = self.teachers[idx]["key"]
+            scores[idx] = 1.0 if full == key else 0.8 + 0.1 * len(key) / len(full)
+
+        query_grams = trigrams(key)
+        common = {}
+        for gram in query_grams:
+            for idx in self.grams.get(gram, ()):
+                common[idx] = common.get(idx, 0) + 1
+        for idx, count in common.items():
+            # коэффициент Дайса по множествам триграмм
+            dice = 2 * count / (len(query_grams) + self.gram_counts[idx])
+            if dice >= MIN_TRIGRAM_SCORE and 0.8 * dice > scores.get(idx, 0):
+                scores[idx] = 0.8 * dice
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [
+            {
+                "key": self.teachers[idx]["key"],
+                "name": self.teachers[idx]["name"],
+                "lessons": self.teachers[idx]["lessons"],
+                "score": round(score, 3),
+            }
+            for idx, score in best
+        ]
+
+
+_index = TeacherSearchIndex([])
+_index_generation = None
+_index_lock = asyncio.Lock()
+
+
+async def _load_teachers() -> list[dict]:
+    rows = (
+        await db[TEACHER_LESSONS_COLLECTION]
+        .aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": "$teacher_key",
+                        "names": {"$addToSet": "$teacher"},
+                        "lessons": {"$sum": 1},
+                    }
+                }
+            ]
+        )
+        .to_list(None)
+    )
+    return [
+        {
+            "key": row["_id"],
+            "name": normalize_teacher_name(min(row["names"])) or min(row["names"]),
+            "lessons": row["lessons"],
+        }
+        for row in rows
+        if row["_id"]
+    ]
+
+
+async def get_teacher_search_index() -> TeacherSearchIndex:
+    """Индекс текущего поколения расписания (пересобирается при его смене)"""
+    global _index, _index_generation
+
+    await schedule_cache.sync_generation()
+    generation = schedule_cache.generation
+    if generation is not None and generation == _index_generation:
+        return _index
+
+    async with _index_lock:
+        if generation is None or generation != _index_generation:
+            _index = TeacherSearchIndex(await _load_teachers())
+            _index_generation = generation
+    return _index
+
+
+async def find_teacher_keys(fio_normalized: str) -> list[str]:
+    """Ключи преподавателей по введённому ФИО — из индекса в памяти, без запросов"""
+    index = await get_teacher_search_index()
+    return index.resolve(fio_normalized)
+
+
+async def search_teachers(query: str, limit: int = 10) -> list[dict]:
+    index = await get_teacher_search_index()
+    return index.search(query, limit)
@@ -0,0 +1,209 @@
+"""
+Массовая загрузка пользователей.
+
+Тело запроса — JSON-массив или NDJSON записей User — читается потоком
+и разбирается по мере поступления. Записи применяются upsert'ами по
+(platform, user_id) через bulk_write пачками; для каждой пачки
+возвращаются счётчики и ошибки. Счётчики user_stats получают $inc
+по прежнему и новому состоянию записанных пользователей.
+"""
+
+import codecs
+import json
+import re
+from decouple import config
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.database import db
+from app.models.user import User
+from app.services.user_stats import COUNTER_FIELDS, add_user_change, user_changes
+
+BULK_BATCH_SIZE = config("USERS_BULK_BATCH_SIZE", default=500, cast=int)
+
+_decoder = json.JSONDecoder()
+# разделители между записями: пробелы, переводы строк, скобки и запятые массива
+_SEPARATORS = re.compile(r"[ \t\r\n,\[\]]*")
+# оборванные на конце буфера литерал, число или \uXXXX дают ошибку на несколько
+# символов раньше конца — такую ошибку могут исправить следующие байты
+_TRUNCATION_MARGIN = 16
+
+
+def _is_final_error(error: json.JSONDecodeError, buffer_len: int) -> bool:
+    """Ошибка разбора, которую дальнейшие данные уже не исправят"""
+    if error.msg.startswith("Unterminated string"):
+        return False
+    return error.pos + _TRUNCATION_MARGIN < buffer_len
+
+
+async def iter_json_records(chunks):
+    """
+    Объекты из потока байтов JSON-массива или NDJSON.
+    Буфер разбирается с позиции pos и обрезается один раз на чанк.
+    Ошибка разбора — ValueError с позицией в потоке, сразу как только
+    её не может исправить продолжение потока.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    offset = 0  # позиция начала buffer в потоке
+    chunks = chunks.__aiter__()
+    finished = False
+
+    while True:
+        pos = _SEPARATORS.match(buffer).end()
+        while pos < len(buffer):
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if finished or _is_final_error(e, len(buffer)):
+                    raise ValueError(f"Некорректный JSON (позиция {offset + e.pos})")
+                break
+            # запись, упёршаяся в конец буфера, может быть оборвана
+            if end == len(buffer) and not finished:
+                break
+            yield record
+            pos = _SEPARATORS.match(buffer, end).end()
+
+        if finished:
+            return
+        buffer = buffer[pos:]
+        offset += pos
+        try:
+            buffer += utf8.decode(await chunks.__anext__())
+        except StopAsyncIteration:
+            buffer += utf8.decode(b"", final=True)
+            finished = True
+
+
+def _upsert(user: User) -> UpdateOne:
+    return UpdateOne(
+        {"platform": user.platform, "user_id": user.user_id},
+        {"$set": user.dict()},
+        upsert=True,
+    )
+
+
+async def _current_users(batch: list[tuple[int, User]]) -> dict:
+    """(platform, user_id) -> поля счётчиков пользователей пачки, что уже есть"""
+    ids = {}
+    for _, user in batch:
+        ids.setdefault(user.platform, set()).add(user.user_id)
+    query = {
+        "$or": [
+            {"platform": platform, "user_id": {"$in": sorted(user_ids)}}
+            for platform, user_ids in ids.items()
+        ]
+    }
+    return {
+        (doc["platform"], doc["user_id"]): doc
+        async for doc in db.users.find(
+            query, {"_id": 0, "user_id": 1, **dict.fromkeys(COUNTER_FIELDS, 1)}
+        )
+    }
+
+
+async def _write_batch(batch: list[tuple[int, User]], ordered: bool) -> dict:
+    result = {
+        "first_index": batch[0][0],
+        "size": len(batch),
+        "matched": 0,
+        "modified": 0,
+        "upserted": 0,
+        "errors": [],
+    }
+    # приращения счётчиков считаются по результату bulk_write
+    platforms = {user.platform for _, user in batch}
+    async with user_changes(platforms) as incs:
+        known = await _current_users(batch)
+        try:
+            write = await db.users.bulk_write(
+                [_upsert(user) for _, user in batch], ordered=ordered
+            )
+            details = write.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for error in details.get("writeErrors", []):
+                result["errors"].append(
+                    {"index": batch[error["index"]][0], "error": error.get("errmsg")}
+                )
+        result["matched"] = details.get("nMatched", 0)
+        result["modified"] = details.get("nModified", 0)
+        result["upserted"] = details.get("nUpserted", 0)
+
+        failed = {error["index"] for error in details.get("writeErrors", [])}
+        upserted = {item["index"] for item in details.get("upserted", [])}
+        for i, (_, user) in enumerate(batch):
+            if i in failed:
+                if ordered:
+                    break  # после первой ошибки ordered-пачка не выполняется
+                continue
+            key = (user.platform, user.user_id)
+            if i not in upserted and key not in known:
+                continue  # вставлен параллельно — его уже посчитал вставивший
+            after = user.dict()
+            add_user_change(incs, None if i in upserted else known[key], after)
+            known[key] = after
+    return result
+
+
+async def bulk_upsert_users(chunks, ordered: bool, batch_size: int) -> dict:
+    """
+    Применяет записи из потока пачками по batch_size.
+    ordered=True: запись останавливается на первой ошибке (как в bulk_write).
+    Счётчики user_stats меняются $inc по результату каждой пачки.
+    """
+    batches = []
+    invalid = []
+    batch = []
+    received = 0
+    stopped = False
+
+    async def flush():
+        nonlocal batch, stopped
+        if batch:
+            batches.append(await _write_batch(batch, ordered))
+            stopped = ordered and bool(batches[-1]["errors"])
+            batch = []
+
+    try:
+        async for record in iter_json_records(chunks):
+            index = received
+            received += 1
+            if stopped:
+                continue
+            user, message = None, "Ожидался объект User"
+            if isinstance(record, dict):
+                try:
+                    user = User(**record)
+                except ValidationError as e:
+                    error = e.errors()[0]
+                    message = f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            if user is None:
+                invalid.append({"index": index, "error": message})
+                if ordered:
+                    await flush()
+                    stopped = True
+                continue
+
+            batch.append((index, user))
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+        parse_error = None
+    except ValueError as e:
+        await flush()
+        parse_error = str(e)
+
+    return {
+        "received": received,
+        "ordered": ordered,
+        "batch_size": batch_size,
+        "batches": batches,
+        "invalid": invalid,
+        "stopped": stopped,
+        "parse_error": parse_error,
+        "matched": sum(b["matched"] for b in batches),
+        "modified": sum(b["modified"] for b in batches),
+        "upserted": sum(b["upserted"] for b in batches),
+        "errors": sum(len(b["errors"]) for b in batches) + len(invalid),
+    }
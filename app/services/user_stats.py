@@ -0,0 +1,273 @@
+"""
+Счётчики пользователей по платформам (коллекция user_stats).
+
+Документ на платформу: total, roles.<роль>, subscriptions и groups.<группа> —
+число пользователей группы. Счётчики меняются атомарным $inc при создании,
+изменении и удалении пользователя, так что статистика — чтение одного
+документа. reconcile_user_stats пересчитывает всё с нуля, сообщает о
+расхождениях и исправляет их через $inc разницы.
+
+Чтобы поправка пересчёта не задела параллельные изменения, запись в users
+обрамляется user_changes: на время записи у платформы взведён pending,
+а каждое изменение документа статистики увеличивает seq. Поправка
+применяется, только если снимок был без pending и seq с тех пор не менялся.
+"""
+
+from contextlib import asynccontextmanager
+from pymongo.errors import DuplicateKeyError
+from app.database import db
+
+USER_STATS_COLLECTION = "user_stats"
+
+
+# пустое имя не может быть ключом поля; одиночный % после экранирования не встречается
+EMPTY_KEY = "%"
+
+
+def escape_key(key: str) -> str:
+    """Имя группы (роли) как ключ поля MongoDB: без '.' и '$', не пустое"""
+    if not key:
+        return EMPTY_KEY
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def unescape_key(key: str) -> str:
+    if key == EMPTY_KEY:
+        return ""
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+# поля пользователя, от которых зависят счётчики
+COUNTER_FIELDS = ("platform", "role", "group_name", "schedule_enabled")
+
+
+def _user_counters(user: dict) -> dict:
+    counters = {"total": 1}
+    if user.get("role"):
+        counters[f"roles.{escape_key(user['role'])}"] = 1
+    if user.get("schedule_enabled"):
+        counters["subscriptions"] = 1
+    # как и в прежней агрегации, пустое имя группы — тоже группа
+    if user.get("group_name") is not None:
+        counters[f"groups.{escape_key(user['group_name'])}"] = 1
+    return counters
+
+
+def add_user_change(incs: dict, before: dict | None, after: dict | None):
+    """Добавляет в incs (платформа -> {поле: приращение}) перенос before -> after"""
+    for user, sign in ((before, -1), (after, 1)):
+        if not user:
+            continue
+        platform_incs = incs.setdefault(user.get("platform", "telegram"), {})
+        for field, value in _user_counters(user).items():
+            platform_incs[field] = platform_incs.get(field, 0) + sign * value
+
+
+async def _apply_incs(incs: dict, finished: set = frozenset()):
+    """
+    Один $inc на платформу: накопленные приращения и снятие pending
+    платформ finished. Каждое изменение увеличивает seq.
+    """
+    for platform in set(incs) | set(finished):
+        fields = {
+            field: value for field, value in incs.get(platform, {}).items() if value
+        }
+        if platform in finished:
+            fields["pending"] = -1
+        if fields:
+            await db[USER_STATS_COLLECTION].update_one(
+                {"_id": platform}, {"$inc": {**fields, "seq": 1}}, upsert=True
+            )
+
+
+@asynccontextmanager
+async def user_changes(platforms):
+    """
+    Обрамляет запись в users пользователей платформ platforms.
+    Выдаёт incs для add_user_change; на выходе (и при ошибке — с тем,
+    что успели накопить) приращения применяются вместе со снятием pending.
+    """
+    platforms = set(platforms)
+    for platform in platforms:
+        await db[USER_STATS_COLLECTION].update_one(
+            {"_id": platform}, {"$inc": {"pending": 1, "seq": 1}}, upsert=True
+        )
+    incs = {}
+    try:
+        yield incs
+    finally:
+        await _apply_incs(incs, platforms)
+
+
+def _stats_view(doc: dict) -> dict:
+    roles = doc.get("roles") or {}
+    return {
+        "total": doc.get("total", 0),
+        "students": roles.get("student", 0),
+        "teachers": roles.get("teacher", 0),
+        "admins": roles.get("admin", 0),
+        "subscriptions": doc.get("subscriptions", 0),
+        "groups": sum(1 for count in (doc.get("groups") or {}).values() if count > 0),
+    }
+
+
+async def get_platform_stats(platform: str) -> dict:
+    doc = await db[USER_STATS_COLLECTION].find_one({"_id": platform}) or {}
+    return _stats_view(doc)
+
+
+async def _compute_stats(platform: str | None) -> dict:
+    """Счётчики по пользователям из users: платформа -> документ user_stats"""
+    match = {"platform": platform} if platform else {}
+    rows = await db.users.aggregate(
+        [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": {
+                        "platform": "$platform",
+                        "role": "$role",
+                        "group_name": "$group_name",
+                    },
+                    "total": {"$sum": 1},
+                    "subscriptions": {"$sum": {"$cond": ["$schedule_enabled", 1, 0]}},
+                }
+            },
+        ]
+    ).to_list(None)
+
+    stats = {}
+    for row in rows:
+        key = row["_id"]
+        doc = stats.setdefault(
+            key.get("platform", "telegram"),
+            {"total": 0, "roles": {}, "subscriptions": 0, "groups": {}},
+        )
+        doc["total"] += row["total"]
+        if key.get("role"):
+            role = escape_key(key["role"])
+            doc["roles"][role] = doc["roles"].get(role, 0) + row["total"]
+        doc["subscriptions"] += row["subscriptions"]
+        if key.get("group_name") is not None:
+            group = escape_key(key["group_name"])
+            doc["groups"][group] = doc["groups"].get(group, 0) + row["total"]
+    return stats
+
+
+def _drift(stored: dict, actual: dict) -> dict:
+    """Поля, где сохранённые счётчики расходятся с пересчитанными"""
+    drift = {}
+    for field in ("total", "subscriptions"):
+        if stored.get(field, 0) != actual.get(field, 0):
+            drift[field] = {"stored": stored.get(field, 0), "actual": actual[field]}
+    for section in ("roles", "groups"):
+        stored_section = stored.get(section) or {}
+        actual_section = actual.get(section) or {}
+        for key in set(stored_section) | set(actual_section):
+            stored_value = stored_section.get(key, 0)
+            actual_value = actual_section.get(key, 0)
+            if stored_value != actual_value:
+                name = unescape_key(key)
+                drift[f"{section}.{name}"] = {
+                    "stored": stored_value,
+                    "actual": actual_value,
+                }
+    return drift
+
+
+def _counter_fields(doc: dict) -> dict:
+    """Документ user_stats -> {путь поля: значение} для $inc"""
+    fields = {field: doc.get(field, 0) for field in ("total", "subscriptions")}
+    for section in ("roles", "groups"):
+        for key, value in (doc.get(section) or {}).items():
+            fields[f"{section}.{key}"] = value
+    return fields
+
+
+async def _stored_stats(platform: str | None) -> dict:
+    query = {"_id": platform} if platform else {}
+    return {doc["_id"]: doc async for doc in db[USER_STATS_COLLECTION].find(query)}
+
+
+async def _correct(name: str, stored: dict, have: dict, need: dict) -> bool:
+    """
+    $inc разницы need - have, если документ не менялся со снимка stored
+    (тот же seq). False — изменился, поправка не применена.
+    """
+    delta = {
+        field: need.get(field, 0) - have.get(field, 0)
+        for field in set(have) | set(need)
+    }
+    delta = {field: value for field, value in delta.items() if value}
+    seq = stored.get("seq")
+    # документ без seq (или ещё не созданный) — $exists: при upsert
+    # условие не попадает в новый документ, в отличие от seq: None
+    version = {"seq": seq} if seq is not None else {"seq": {"$exists": False}}
+    try:
+        result = await db[USER_STATS_COLLECTION].update_one(
+            {"_id": name, **version},
+            {"$inc": {**delta, "seq": 1}},
+            upsert=not stored,
+        )
+    except DuplicateKeyError:
+        return False  # документ платформы появился после снимка
+    return bool(result.matched_count or result.upserted_id)
+
+
+async def reconcile_user_stats(
+    platform: str | None = None, log: bool = True, attempts: int = 3
+) -> dict:
+    """
+    Пересчитывает счётчики по коллекции users (для одной платформы или всех)
+    и исправляет их через $inc разницы, не затирая параллельные $inc.
+    Платформа, у которой во время пересчёта шла запись (pending или новый
+    seq), пересчитывается заново — до attempts раз.
+    Возвращает расхождения: платформа -> {поле: stored/actual}.
+    """
+    report = {}
+    empty = {"total": 0, "roles": {}, "subscriptions": 0, "groups": {}}
+    retry = None  # платформы для следующей попытки (None — все)
+    for _ in range(max(attempts, 1)):
+        stored = await _stored_stats(platform)
+        actual = await _compute_stats(platform)
+        busy = set()
+        for name in set(actual) | set(stored):
+            if retry is not None and name not in retry:
+                continue
+            doc = stored.get(name, {})
+            if doc.get("pending"):
+                busy.add(name)
+                continue
+            current = actual.get(name, empty)
+            have = _counter_fields(doc)
+            need = _counter_fields(current)
+            drift = _drift(doc, current)
+            if drift:
+                if not await _correct(name, doc, have, need):
+                    busy.add(name)
+                    continue
+                report[name] = drift
+            # опустевшие группы убираются, только если их никто не успел увеличить
+            for field in have:
+                if field.startswith("groups.") and not need.get(field):
+                    await db[USER_STATS_COLLECTION].update_one(
+                        {"_id": name, field: 0}, {"$unset": {field: ""}}
+                    )
+        if not busy:
+            break
+        retry = busy
+    else:
+        print(
+            "⚠️ Статистика пользователей меняется во время пересчёта — "
+            f"пропущено: {sorted(retry)}"
+        )
+
+    if report and log:
+        print(f"⚠️ Расхождения в статистике пользователей: {sorted(report)}")
+    return report
+
+
+async def ensure_user_stats():
+    """Первичный пересчёт, если счётчиков ещё нет"""
+    if not await db[USER_STATS_COLLECTION].find_one({}, {"_id": 1}):
+        await reconcile_user_stats()
@@ -0,0 +1,61 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из составных частей версии ответа"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+def _to_utc(dt: datetime) -> datetime:
+    # updated_at пишется в UTC, а MongoDB отдаёт даты без зоны
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def latest(*dates: datetime | None) -> datetime | None:
+    """Самая поздняя из дат (None пропускаются) для Last-Modified составного ответа"""
+    known = [_to_utc(dt) for dt in dates if dt]
+    return max(known) if known else None
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None):
+    """
+    Проверяет условные заголовки запроса.
+    If-None-Match имеет приоритет над If-Modified-Since (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return _to_utc(last_modified) <= since
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: datetime | None):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = format_datetime(
+            _to_utc(last_modified), usegmt=True
+        )
+
+
+def not_modified_response(etag: str, last_modified: datetime | None) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
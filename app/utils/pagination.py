@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: ObjectId) -> str:
+    """Непрозрачный курсор: _id последнего документа страницы"""
+    return base64.urlsafe_b64encode(last_id.binary).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return ObjectId(raw)
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    limit: int,
+    cursor: str | None,
+    response: Response,
+    skip: int = 0,
+) -> list[dict]:
+    """
+    Страница по возрастанию _id, начиная после cursor (keyset-пагинация:
+    стоимость не зависит от глубины). Если страница полная, курсор
+    следующей кладётся в заголовок X-Next-Cursor.
+    skip оставлен для старых клиентов и применяется только без cursor.
+    """
+    find = collection.find(query)
+    if cursor:
+        find = collection.find({**query, "_id": {"$gt": decode_cursor(cursor)}})
+    elif skip:
+        find = find.skip(skip)
+    docs = await find.sort("_id", 1).limit(limit).to_list(limit)
+    if len(docs) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1]["_id"])
+    return docs
+
+
+async def iter_ndjson(cursor, model):
+    """Строки NDJSON из курсора Motor (документы читаются пачками batch_size)"""
+    async for doc in cursor:
+        yield json.dumps(jsonable_encoder(model(**doc)), ensure_ascii=False) + "\n"
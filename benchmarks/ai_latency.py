@@ -0,0 +1,239 @@
+"""
+Нагрузочный тест роутера /ai на локальной заглушке модели.
+
+Поднимает benchmarks/fake_llm.py (в отдельном потоке) и API (uvicorn в этом
+же процессе, расписания — из MongoDB по MONGO_URL), затем гоняет
+конкурентные запросы /ai/schedule/{группа}?day= и /ai/teacher/{ФИО}?day=.
+Отчёт: p50/p95/p99 по каждому эндпоинту (для --stream ещё время до первого
+байта), пропускная способность и задержка event loop — блокирующий вызов
+в обработчиках сразу виден по её p99/max.
+
+    python -m benchmarks.ai_latency --requests 500 --concurrency 50 --latency 0.5
+
+Запросы выбираются из --targets разных (группа/преподаватель, день), так что
+часть из них — повторы: видно и кэш, и склейку одновременных запросов.
+Модель запускается под именем fake-llm-<id>: ключи кэша описаний свои для
+каждого прогона, созданные записи в конце удаляются (--keep — оставить).
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import quote
+import httpx
+import uvicorn
+from benchmarks.fake_llm import add_arguments, app_from_args
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def start_fake_llm(args) -> tuple[uvicorn.Server, object]:
+    llm_app = app_from_args(args)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            llm_app, host="127.0.0.1", port=args.llm_port, log_level="warning"
+        )
+    )
+    # свой поток и свой event loop: задержки заглушки не зависят от API
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, llm_app
+
+
+async def measure_loop_lag(samples: list[float], stop: asyncio.Event, interval=0.01):
+    """Насколько позже заказанного просыпается корутина на этом event loop"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+async def load_targets(count: int, teacher_share: float) -> list[tuple[str, str]]:
+    """(эндпоинт, путь запроса) для count разных целей"""
+    from app.database import db
+    from app.services.schedule_service import ScheduleService
+    from app.services.teacher_search import get_teacher_search_index
+
+    targets = {"schedule": [], "teacher": []}
+    for group in sorted(await db.schedules.distinct("group_name")):
+        model = await ScheduleService.get_schedule_by_group(group, None)
+        targets["schedule"].extend(
+            f"/ai/schedule/{quote(group, safe='')}?day={quote(day)}"
+            # как и прогрев: только дни с парами
+            for day in ScheduleService.lesson_days(model)
+        )
+    index = await get_teacher_search_index()
+    for teacher in index.teachers:
+        schedule = await ScheduleService.get_teacher_schedule(
+            teacher["name"], None, teacher["key"]
+        )
+        days = dict.fromkeys(
+            [*schedule.schedule.first_shift, *schedule.schedule.second_shift]
+        )
+        targets["teacher"].extend(
+            f"/ai/teacher/{quote(teacher['name'], safe='')}?day={quote(day)}"
+            for day in days
+        )
+
+    rng = random.Random(0)
+    teachers = min(round(count * teacher_share), len(targets["teacher"]))
+    groups = min(count - teachers, len(targets["schedule"]))
+    return [("schedule", path) for path in rng.sample(targets["schedule"], groups)] + [
+        ("teacher", path) for path in rng.sample(targets["teacher"], teachers)
+    ]
+
+
+async def run_requests(base_url: str, plan, concurrency: int, stream: bool) -> dict:
+    results = {}  # эндпоинт -> {"latency": [...], "ttfb": [...], "errors": n}
+    queue = iter(plan)
+
+    async def worker(client: httpx.AsyncClient):
+        for kind, path in queue:
+            if stream:
+                base, _, query = path.partition("?")
+                path = f"{base}/stream?{query}"
+            stats = results.setdefault(kind, {"latency": [], "ttfb": [], "errors": 0})
+            started = time.perf_counter()
+            try:
+                async with client.stream("GET", path) as response:
+                    ttfb = None
+                    body = []
+                    async for chunk in response.aiter_bytes():
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - started
+                        body.append(chunk)
+                    failed = response.status_code != 200 or (
+                        stream and b"event: error" in b"".join(body)
+                    )
+            except httpx.HTTPError:
+                failed = True
+            if failed:
+                stats["errors"] += 1
+                continue
+            stats["latency"].append(time.perf_counter() - started)
+            stats["ttfb"].append(ttfb or 0.0)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=None, limits=limits
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return results
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def report(results, wall: float, lag: list[float], llm_requests: int, cache: dict):
+    header = f"{'эндпоинт':10} {'n':>6} {'ошибок':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'TTFB p50':>9} {'TTFB p99':>9}"
+    print(header)
+    print("-" * len(header))
+    total = 0
+    for kind, stats in sorted(results.items()):
+        latency = stats["latency"]
+        total += len(latency)
+        print(
+            f"{kind:10} {len(latency):>6} {stats['errors']:>7} "
+            f"{_ms(percentile(latency, 50)):>9} {_ms(percentile(latency, 95)):>9} "
+            f"{_ms(percentile(latency, 99)):>9} "
+            f"{_ms(percentile(stats['ttfb'], 50)):>9} "
+            f"{_ms(percentile(stats['ttfb'], 99)):>9}"
+        )
+    print()
+    print(f"время: {wall:.2f} с, пропускная способность: {total / wall:.1f} запр/с")
+    if lag:
+        print(
+            f"задержка event loop: p50 {_ms(percentile(lag, 50))} мс, "
+            f"p99 {_ms(percentile(lag, 99))} мс, max {_ms(max(lag))} мс, "
+            f"среднее {_ms(statistics.mean(lag))} мс"
+        )
+    print(
+        f"запросов к модели: {llm_requests}, склеено: {cache.get('coalesced')}, "
+        f"попаданий в кэш: {cache.get('memory_hits', 0) + cache.get('db_hits', 0)}"
+    )
+
+
+async def main(args):
+    run_id = uuid.uuid4().hex[:8]
+    model = f"fake-llm-{run_id}"
+    # до импорта приложения: конфигурация читается при импорте
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{args.llm_port}/v1"
+    os.environ["OPENROUTER_MODEL"] = model
+    os.environ["AI_MAX_RETRIES"] = "0"
+    os.environ["AI_WARMUP_ENABLED"] = "false"
+    # заглушке ключ не нужен, но без него приложение не импортируется
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-llm")
+
+    from app.database import db
+    from app.main import app
+    from app.services.ai_cache import AI_CACHE_COLLECTION, ai_cache
+
+    llm_server, llm_app = start_fake_llm(args)
+    api = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=args.api_port, log_level="warning")
+    )
+    api_task = asyncio.create_task(api.serve())
+    while not api.started:
+        if api_task.done():
+            return await api_task
+        await asyncio.sleep(0.01)
+
+    try:
+        targets = await load_targets(args.targets, args.teacher_share)
+        if not targets:
+            print("В базе нет расписаний — сначала загрузите .docx")
+            return
+        rng = random.Random(1)
+        plan = [rng.choice(targets) for _ in range(args.requests)]
+
+        lag = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(measure_loop_lag(lag, stop))
+        started = time.perf_counter()
+        results = await run_requests(
+            f"http://127.0.0.1:{args.api_port}", plan, args.concurrency, args.stream
+        )
+        wall = time.perf_counter() - started
+        stop.set()
+        await probe
+
+        print(
+            f"запросов: {args.requests}, одновременно: {args.concurrency}, "
+            f"разных целей: {len(targets)}, stream: {args.stream}, "
+            f"модель: задержка {args.latency} с, {args.tps} ток/с, {args.tokens} ток.\n"
+        )
+        report(results, wall, lag, llm_app.state.requests, ai_cache.stats())
+    finally:
+        if not args.keep:
+            await db[AI_CACHE_COLLECTION].delete_many({"model": model})
+        api.should_exit = True
+        await api_task
+        llm_server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /ai")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--targets", type=int, default=40, help="разных целей")
+    parser.add_argument("--teacher-share", type=float, default=0.3)
+    parser.add_argument("--stream", action="store_true", help="SSE-эндпоинты")
+    parser.add_argument("--keep", action="store_true", help="оставить кэш прогона")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--llm-port", type=int, default=8766)
+    add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
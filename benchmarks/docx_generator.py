@@ -0,0 +1,260 @@
+"""
+Генератор синтетических DOCX расписаний в формате колледжа.
+
+На каждую группу — абзац "Расписание уроков для X группы" и таблица:
+колонка номеров пар и по колонке на день (день с подгруппами — две колонки
+под объединённым заголовком). Каждая пара — две строки-половинки.
+Содержимое ячеек случайное, но воспроизводимое (seed):
+
+- целая пара — ячейка, объединённая по вертикали на обе половинки;
+- половинки — разные занятия (или только одна) в строках пары;
+- подгруппы — разные занятия в двух колонках дня (общее — объединённая ячейка);
+- нулевая пара — строка "0" над первой парой;
+- смещённые строки — пустые колонки сетки до и после ячеек строки
+  (w:gridBefore / w:gridAfter), как в таблицах, сдвинутых в Word.
+
+    python -m benchmarks.docx_generator out.docx --groups 500 --seed 1
+"""
+
+import argparse
+import random
+from docx import Document
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+SUBJECTS = [
+    "Математика",
+    "Физика",
+    "История",
+    "Английский язык",
+    "Физическая культура",
+    "Информатика",
+    "Русский язык",
+    "Литература",
+    "МДК 01.01 Разработка программных модулей",
+    "МДК 07.01 Управление и автоматизация баз данных",
+    "ОП.04 Основы алгоритмизации",
+    "Экономика организации",
+]
+SURNAMES = [
+    "Иванов",
+    "Петрова",
+    "Сидоров-Кузнецов",
+    "Смирнова",
+    "Кузнецов",
+    "Попова",
+    "Васильев",
+    "Соколова",
+    "Михайлов",
+    "Новикова",
+    "Фёдоров",
+    "Морозова",
+]
+INITIALS = "АБВГДЕИКЛМНОПРСТ"
+ROOMS = ["101", "15", "201", "305", "412", "27", ""]
+SPECIALTIES = ["ИС", "ПК", "Э", "БД", "СА", "Т"]
+
+
+class _Grid:
+    """
+    Ячейки таблицы по (строка, колонка) без пересчёта сетки: table.cell()
+    и cell.merge() python-docx обходят всю таблицу на каждый вызов.
+    """
+
+    def __init__(self, table, cols: int, before: int = 0, after: int = 0):
+        self.table = table
+        self.cells = table._cells
+        self.before = before
+        self.after = after
+        self.width = before + cols + after
+
+    def cell(self, row: int, col: int):
+        return self.cells[row * self.width + self.before + col]
+
+    def merge(self, top: int, left: int, bottom: int, right: int):
+        """Объединение прямоугольника (как cell.merge), возвращает ячейку"""
+        for row in range(top, bottom + 1):
+            tc = self.cell(row, left)._tc
+            if right > left:
+                tc.grid_span = right - left + 1
+                for col in range(left + 1, right + 1):
+                    extra = self.cell(row, col)._tc
+                    extra.getparent().remove(extra)
+            if bottom > top:
+                tc.vMerge = "restart" if row == top else "continue"
+        return self.cell(top, left)
+
+    def trim(self):
+        """Убирает крайние колонки: строки начинаются и кончаются раньше сетки"""
+        for row, tr in enumerate(self.table._tbl.tr_lst):
+            skipped = [*range(self.before), *range(self.width - self.after, self.width)]
+            for col in skipped:
+                tc = self.cells[row * self.width + col]._tc
+                tc.getparent().remove(tc)
+            tr_pr = tr.get_or_add_trPr()
+            if self.before:
+                tr_pr.get_or_add_gridBefore().val = self.before
+            if self.after:
+                tr_pr.get_or_add_gridAfter().val = self.after
+
+
+class ScheduleGenerator:
+    """
+    Доли (0..1) задают, как часто встречаются особые случаи: zero_lessons —
+    нулевая пара в день, merged — пара объединённой ячейкой, half_pairs —
+    половинки, subgroup_days — день с подгруппами, empty — пустая пара,
+    grid_offsets — таблица со смещёнными строками (gridBefore / gridAfter).
+    """
+
+    def __init__(
+        self,
+        seed: int = 1,
+        lessons: int = 6,
+        zero_lessons: float = 0.15,
+        merged: float = 0.5,
+        half_pairs: float = 0.2,
+        subgroup_days: float = 0.2,
+        empty: float = 0.25,
+        teachers: int | None = None,
+        grid_offsets: float = 0.0,
+    ):
+        self.rng = random.Random(seed)
+        self.lessons = lessons
+        self.zero_lessons = zero_lessons
+        self.merged = merged
+        self.half_pairs = half_pairs
+        self.subgroup_days = subgroup_days
+        self.empty = empty
+        self.teachers = teachers
+        self.grid_offsets = grid_offsets
+
+    def _teacher_pool(self, groups: int) -> list[str]:
+        count = self.teachers or max(len(SURNAMES), groups // 2)
+        count = min(count, len(SURNAMES) * len(INITIALS) * (len(INITIALS) - 1))
+        pool = set()
+        while len(pool) < count:
+            initials = self.rng.sample(INITIALS, 2)
+            pool.add(f"{self.rng.choice(SURNAMES)} {initials[0]}.{initials[1]}.")
+        return sorted(pool)
+
+    def _lesson_text(self) -> str:
+        room = self.rng.choice(ROOMS)
+        teacher = self.rng.choice(self._pool)
+        return f"{self.rng.choice(SUBJECTS)}\n{teacher} {room}".strip()
+
+    def _fill(self, grid, row: int, columns: list[int]):
+        """Пара (две строки от row) в колонках одного дня"""
+        mode = self.rng.random()
+        if mode < self.empty:
+            return
+        mode = self.rng.random()
+        if len(columns) == 2 and self.rng.random() < 0.5:
+            # подгруппы: своя пара в каждой колонке
+            for column in columns:
+                self._fill(grid, row, [column])
+            return
+        first, last = columns[0], columns[-1]
+        if mode < self.merged:
+            cell = grid.merge(row, first, row + 1, last)
+            cell.text = self._lesson_text()
+        elif mode < self.merged + self.half_pairs:
+            # половинки: занята одна или обе, разными занятиями
+            halves = self.rng.choice([(0,), (1,), (0, 1)])
+            for half in halves:
+                grid.merge(row + half, first, row + half, last).text = (
+                    self._lesson_text()
+                )
+        else:
+            # одна и та же пара текстом в обеих половинках (без объединения)
+            text = self._lesson_text()
+            for half in (0, 1):
+                grid.merge(row + half, first, row + half, last).text = text
+
+    def _add_group(self, doc, group: str):
+        doc.add_paragraph(f"Расписание уроков для {group} группы")
+
+        day_columns = []
+        column = 1
+        for _ in DAYS:
+            width = 2 if self.rng.random() < self.subgroup_days else 1
+            day_columns.append(list(range(column, column + width)))
+            column += width
+
+        has_zero = self.rng.random() < 0.5
+        rows = 1 + int(has_zero) + 2 * self.lessons
+        # без смещений случайная последовательность та же, что и раньше
+        shifted = self.grid_offsets and self.rng.random() < self.grid_offsets
+        before, after = (
+            (self.rng.randint(1, 2), self.rng.randint(0, 1)) if shifted else (0, 0)
+        )
+        table = doc.add_table(rows=rows, cols=before + column + after)
+        grid = _Grid(table, column, before, after)
+        grid.cell(0, 0).text = "№"
+        for day, columns in zip(DAYS, day_columns):
+            grid.merge(0, columns[0], 0, columns[-1]).text = day
+
+        row = 1
+        if has_zero:
+            grid.cell(row, 0).text = "0"
+            for columns in day_columns:
+                if self.rng.random() < self.zero_lessons:
+                    cell = grid.merge(row, columns[0], row, columns[-1])
+                    cell.text = self._lesson_text()
+            row += 1
+
+        for num in range(1, self.lessons + 1):
+            # номер пары — объединённая на обе половинки ячейка
+            grid.merge(row, 0, row + 1, 0).text = str(num)
+            for columns in day_columns:
+                self._fill(grid, row, columns)
+            row += 2
+        if shifted:
+            grid.trim()
+
+    def generate(self, path: str, groups: int) -> list[str]:
+        """Пишет DOCX на groups групп, возвращает имена групп"""
+        self._pool = self._teacher_pool(groups)
+        doc = Document()
+        doc.add_paragraph("Утверждаю: директор колледжа")
+        names = []
+        for idx in range(groups):
+            specialty = SPECIALTIES[idx % len(SPECIALTIES)]
+            course = idx // len(SPECIALTIES) % 4 + 1
+            names.append(f"{specialty}-{course}{idx // (len(SPECIALTIES) * 4) + 1}")
+            self._add_group(doc, names[-1])
+            doc.add_paragraph("")
+        # таблица без дней недели — не расписание, парсер её пропускает
+        doc.add_table(rows=1, cols=2).cell(0, 0).text = "Заведующий отделением"
+        doc.save(path)
+        return names
+
+
+def generate_schedule_docx(path: str, groups: int, seed: int = 1, **options):
+    return ScheduleGenerator(seed=seed, **options).generate(path, groups)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синтетическое расписание DOCX")
+    parser.add_argument("path")
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--lessons", type=int, default=6)
+    parser.add_argument("--zero-lessons", type=float, default=0.15)
+    parser.add_argument("--merged", type=float, default=0.5)
+    parser.add_argument("--half-pairs", type=float, default=0.2)
+    parser.add_argument("--subgroup-days", type=float, default=0.2)
+    parser.add_argument("--empty", type=float, default=0.25)
+    parser.add_argument("--grid-offsets", type=float, default=0.0)
+    args = parser.parse_args()
+    names = generate_schedule_docx(
+        args.path,
+        args.groups,
+        seed=args.seed,
+        lessons=args.lessons,
+        zero_lessons=args.zero_lessons,
+        merged=args.merged,
+        half_pairs=args.half_pairs,
+        subgroup_days=args.subgroup_days,
+        empty=args.empty,
+        grid_offsets=args.grid_offsets,
+    )
+    print(f"{args.path}: {len(names)} групп")
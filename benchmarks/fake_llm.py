@@ -0,0 +1,146 @@
+"""
+Локальная заглушка OpenAI-совместимого chat-completions API.
+
+Отвечает на POST /v1/chat/completions (обычный ответ и stream=True в виде
+SSE-чанков) текстом в формате AI-описаний: вступление, "---", список пар,
+"---", разбор. Задержка до первого токена, скорость и длина ответа
+настраиваются, так что /ai можно нагружать без сети и без расхода квоты.
+
+    python -m benchmarks.fake_llm --port 8081 --latency 0.5 --tps 80
+
+и в окружении API:
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:8081/v1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = (
+    "пара занятие аудитория перерыв лекция практика группа день неделя "
+    "преподаватель предмет расписание утро обед вечер подготовка"
+).split()
+
+
+def fake_answer(tokens: int, seed: str) -> list[str]:
+    """Ответ из tokens частей (~токенов) в формате описания с разделителями"""
+    rng = random.Random(seed)
+    words = [rng.choice(_WORDS) for _ in range(max(tokens - 4, 3))]
+    third = len(words) // 3
+    lessons = [f"\n{i + 1}. {word}" for i, word in enumerate(words[third : 2 * third])]
+    return (
+        [f"{word} " for word in words[:third]]
+        + ["\n---"]
+        + lessons
+        + ["\n---\n"]
+        + [f"{word} " for word in words[2 * third :]]
+    )
+
+
+def create_app(
+    latency: float = 0.5,
+    tokens_per_second: float = 80.0,
+    tokens: int = 200,
+    rate_limit: float = 0.0,
+) -> FastAPI:
+    """
+    latency — задержка до первого токена (с), tokens_per_second — скорость
+    генерации, tokens — длина ответа, rate_limit — доля ответов 429.
+    """
+    app = FastAPI(title="Fake LLM")
+    app.state.requests = 0
+
+    def _chunk(completion_id: str, model: str, delta: dict, finish=None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake-llm", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        model = body.get("model", "fake-llm")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        if rate_limit and random.random() < rate_limit:
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": "1"},
+                content={"error": {"message": "Rate limit", "code": 429}},
+            )
+
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        parts = fake_answer(tokens, prompt)
+        step = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+
+        if body.get("stream"):
+
+            async def events():
+                await asyncio.sleep(latency)
+                yield _chunk(completion_id, model, {"role": "assistant"})
+                for part in parts:
+                    yield _chunk(completion_id, model, {"content": part})
+                    await asyncio.sleep(step)
+                yield _chunk(completion_id, model, {}, finish="stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + step * len(parts))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(parts)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(parts),
+                "total_tokens": len(prompt) // 4 + len(parts),
+            },
+        }
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.5, help="до 1-го токена, с")
+    parser.add_argument("--tps", type=float, default=80.0, help="токенов в секунду")
+    parser.add_argument("--tokens", type=int, default=200, help="длина ответа")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля 429")
+
+
+def app_from_args(args) -> FastAPI:
+    return create_app(args.latency, args.tps, args.tokens, args.rate_limit)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Заглушка chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(app_from_args(args), host=args.host, port=args.port)
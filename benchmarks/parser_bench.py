@@ -0,0 +1,231 @@
+"""
+Бенчмарк парсера расписаний на синтетических DOCX.
+
+Для каждого размера (--sizes, по умолчанию 10/100/500/2000 групп) файл
+генерируется benchmarks/docx_generator.py один раз и кладётся в --cache-dir,
+так что все движки и все версии парсера сравниваются на одних входах.
+Для каждого движка PARSER_ENGINES (и xml через пул процессов, если он
+включён) измеряются:
+
+- время разбора (лучшее из --repeat, кэш разбора ячеек сбрасывается);
+- пик памяти (tracemalloc, отдельным прогоном);
+- этапы: xml — чтение document.xml, сопоставление таблиц группам, разбор
+  таблиц (в одном проходе парсера); docx — открытие документа python-docx и остальное;
+- эквивалентность результата эталонному движку docx (или xml, если эталон
+  пропущен через --reference-max).
+
+Отдельно на файле, где часть таблиц со смещёнными строками (gridBefore /
+gridAfter), проверяется эквивалентность движков — без замеров.
+
+    python -m benchmarks.parser_bench --sizes 10 100 500 2000 --repeat 3
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+from docx import Document
+from app.services import schedule_parser
+from app.services.docx_stream import iter_docx_blocks
+from benchmarks.docx_generator import generate_schedule_docx
+
+REFERENCE_ENGINE = "docx"
+POOL_ENGINE = "xml+pool"
+
+
+def fixture_path(cache_dir: str, groups: int, seed: int, **options) -> str:
+    suffix = "".join(f"_{name}{value}" for name, value in sorted(options.items()))
+    path = os.path.join(cache_dir, f"schedule_{groups}_groups_seed{seed}{suffix}.docx")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        generate_schedule_docx(path, groups, seed=seed, **options)
+        size = os.path.getsize(path) / 1024
+        print(
+            f"  сгенерирован {path} ({size:.0f} КБ) за "
+            f"{time.perf_counter() - started:.1f} с"
+        )
+    return path
+
+
+@contextlib.contextmanager
+def quiet():
+    """Парсер печатает каждую таблицу — в отчёте это не нужно"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _parse(path: str, engine: str):
+    if engine == POOL_ENGINE:
+        return asyncio.run(schedule_parser.parse_schedule_async(path, "xml"))[0]
+    return schedule_parser.parse_schedule_from_docx(path, engine)
+
+
+def _timed(func, *args):
+    # кэш разбора ячеек живёт весь процесс — каждый прогон начинаем с холодного
+    schedule_parser._parse_lesson_cell.cache_clear()
+    started = time.perf_counter()
+    with quiet():
+        result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def measure_time(path: str, engine: str, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        elapsed, result = _timed(_parse, path, engine)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure_memory(path: str, engine: str) -> float | None:
+    """Пик выделенной Python-памяти, МБ (для пула — не измеряется)"""
+    if engine == POOL_ENGINE:
+        return None
+    schedule_parser._parse_lesson_cell.cache_clear()
+    tracemalloc.start()
+    try:
+        with quiet():
+            _parse(path, engine)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+class StageTimer:
+    """
+    Итератор-обёртка: суммирует время внутри next() исходного итератора.
+    Вложенные обёртки (чтение внутри сопоставления) дают этапы одного прохода.
+    """
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+def measure_stages(path: str, engine: str) -> dict[str, float]:
+    if engine == "xml":
+        # один проход, как в парсере: чтение и сопоставление идут вперемешку
+        # с разбором, поэтому замеряются вложенными обёртками, а не по отдельности
+        blocks = StageTimer(iter_docx_blocks(path))
+        group_tables = StageTimer(
+            schedule_parser.iter_group_tables(path, [], blocks=blocks)
+        )
+        total, _ = _timed(schedule_parser.parse_group_tables, group_tables)
+        return {
+            "чтение": blocks.elapsed,
+            "сопоставление": group_tables.elapsed - blocks.elapsed,
+            "разбор": total - group_tables.elapsed,
+        }
+    if engine == REFERENCE_ENGINE:
+        load, _ = _timed(Document, path)
+        total, _ = _timed(_parse, path, engine)
+        return {"открытие": load, "остальное": max(total - load, 0.0)}
+    return {}
+
+
+def diff_schedules(expected: dict, actual: dict) -> list[str]:
+    """Группы, где результаты расходятся (пустой список — эквивалентны)"""
+    groups = set(expected) | set(actual)
+    return sorted(g for g in groups if expected.get(g) != actual.get(g))
+
+
+def check_equivalence(results: dict) -> bool:
+    reference = REFERENCE_ENGINE if REFERENCE_ENGINE in results else "xml"
+    ok = True
+    for engine, result in results.items():
+        if engine == reference:
+            continue
+        diff = diff_schedules(results[reference], result)
+        status = "совпадает" if not diff else f"РАСХОДИТСЯ: {diff[:5]}"
+        ok = ok and not diff
+        print(f"  {engine} vs {reference}: {status}")
+    return ok
+
+
+def engines(include_pool: bool) -> list[str]:
+    names = list(schedule_parser.PARSER_ENGINES)
+    if include_pool and schedule_parser.PARSER_WORKERS > 0:
+        names.append(POOL_ENGINE)
+    return names
+
+
+def run(args) -> bool:
+    os.makedirs(args.cache_dir, exist_ok=True)
+    ok = True
+    rows = []
+    for groups in args.sizes:
+        print(f"== {groups} групп")
+        path = fixture_path(args.cache_dir, groups, args.seed)
+        results = {}
+        for engine in engines(not args.no_pool):
+            if engine == REFERENCE_ENGINE and groups > args.reference_max:
+                print(f"  {engine}: пропущен (--reference-max {args.reference_max})")
+                continue
+            elapsed, results[engine] = measure_time(path, engine, args.repeat)
+            memory = None if args.no_memory else measure_memory(path, engine)
+            stages = measure_stages(path, engine)
+            rows.append((groups, engine, elapsed, memory, stages))
+            print(
+                f"  {engine}: {elapsed * 1000:.0f} мс"
+                + (f", пик {memory:.1f} МБ" if memory is not None else "")
+                + "".join(f", {name} {t * 1000:.0f} мс" for name, t in stages.items())
+            )
+
+        ok = check_equivalence(results) and ok
+
+    groups = min(args.sizes)
+    print(f"== {groups} групп, смещённые строки (gridBefore / gridAfter)")
+    path = fixture_path(args.cache_dir, groups, args.seed, grid_offsets=0.5)
+    results = {}
+    for engine in engines(not args.no_pool):
+        with quiet():
+            results[engine] = _parse(path, engine)
+    ok = check_equivalence(results) and ok
+
+    schedule_parser.shutdown_parser_pool()
+
+    print()
+    header = (
+        f"{'групп':>6} {'движок':10} {'время, мс':>10} {'мс/группу':>10} {'пик, МБ':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for groups, engine, elapsed, memory, _ in rows:
+        print(
+            f"{groups:>6} {engine:10} {elapsed * 1000:>10.0f} "
+            f"{elapsed * 1000 / groups:>10.2f} "
+            f"{(f'{memory:.1f}' if memory is not None else '—'):>8}"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк парсера расписаний")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cache-dir", default=os.path.join("benchmarks", ".fixtures"))
+    parser.add_argument(
+        "--reference-max",
+        type=int,
+        default=2000,
+        help="не запускать медленный эталонный движок на файлах больше",
+    )
+    parser.add_argument("--no-pool", action="store_true", help="без пула процессов")
+    parser.add_argument("--no-memory", action="store_true", help="без tracemalloc")
+    args = parser.parse_args()
+    if not run(args):
+        raise SystemExit("Результаты движков расходятся")
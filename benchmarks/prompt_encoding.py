@@ -0,0 +1,132 @@
+"""
+Размер промптов AI-описаний в разных форматах расписания.
+
+Берёт реальные расписания из MongoDB (MONGO_URL из окружения/.env) и для
+каждой версии шаблона промпта (PROMPT_ENCODINGS) строит промпты так же,
+как AIService: неделя группы, день группы и неделя преподавателя.
+
+    python -m benchmarks.prompt_encoding [--teachers 50] [--encoding cl100k_base]
+
+Токены считаются tiktoken, если он установлен (pip install tiktoken),
+иначе — грубая оценка (≈): слова и знаки препинания по отдельности.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+
+# промпты строятся без обращения к модели: ключ нужен только для импорта
+os.environ.setdefault("OPENROUTER_API_KEY", "unused")
+
+from fastapi import HTTPException
+from app.database import db
+from app.services.ai_service import AIService
+from app.services.prompt_encoding import PROMPT_ENCODINGS
+from app.services.schedule_service import ScheduleService
+from app.services.teacher_search import get_teacher_search_index
+
+_ROUGH_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+def token_counter(encoding: str):
+    """(функция подсчёта токенов, точный ли подсчёт)"""
+    try:
+        import tiktoken
+    except ImportError:
+        return (lambda text: len(_ROUGH_TOKEN_RE.findall(text))), False
+    enc = tiktoken.get_encoding(encoding)
+    return (lambda text: len(enc.encode(text))), True
+
+
+async def load_payloads(teachers: int) -> dict[str, list[tuple]]:
+    """Входы описаний по видам: вид -> [(расписание, fio, день)]"""
+    payloads = {"group_week": [], "group_day": [], "teacher_week": []}
+    groups = await db.schedules.distinct("group_name")
+    for group in sorted(groups):
+        model = await ScheduleService.get_schedule_by_group(group, None)
+        payloads["group_week"].append((model, None, None))
+        for day in model.schedule.days:
+            try:
+                schedule = await ScheduleService.get_schedule_by_group(group, day)
+            except HTTPException:
+                continue
+            payloads["group_day"].append((schedule, None, day))
+
+    index = await get_teacher_search_index()
+    for teacher in index.teachers[:teachers]:
+        schedule = await ScheduleService.get_teacher_schedule(
+            teacher["name"], None, teacher["key"]
+        )
+        payloads["teacher_week"].append((schedule, teacher["name"], None))
+    return payloads
+
+
+def measure(payloads, count_tokens) -> dict:
+    """(вид, версия) -> {"chars": [...], "tokens": [...]}"""
+    service = AIService()
+    results = {}
+    for kind, items in payloads.items():
+        for version in PROMPT_ENCODINGS:
+            sizes = results.setdefault((kind, version), {"chars": [], "tokens": []})
+            for schedule, fio, day in items:
+                if kind == "teacher_week":
+                    _, prompt, system_prompt, _ = service._teacher_request(
+                        schedule, fio, day, version
+                    )
+                else:
+                    _, prompt, system_prompt, _ = service._schedule_request(
+                        schedule, day, version
+                    )
+                text = system_prompt + prompt
+                sizes["chars"].append(len(text))
+                sizes["tokens"].append(count_tokens(text))
+    return results
+
+
+def report(results, exact: bool):
+    mark = "" if exact else "≈"
+    header = (
+        f"{'вид':14} {'версия':>6} {'формат':>8} {'n':>5} "
+        f"{'символы, ср':>12} {'токены, ср':>11} {'токены, p95':>12} {'Σ токенов':>10} {'экономия':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for kind in dict.fromkeys(kind for kind, _ in results):
+        base = None
+        for version, encoding in PROMPT_ENCODINGS.items():
+            sizes = results[(kind, version)]
+            if not sizes["tokens"]:
+                continue
+            tokens = sorted(sizes["tokens"])
+            total = sum(tokens)
+            base = base or total
+            p95 = tokens[min(len(tokens) - 1, int(len(tokens) * 0.95))]
+            print(
+                f"{kind:14} {version:>6} {encoding:>8} {len(tokens):>5} "
+                f"{statistics.mean(sizes['chars']):>12.0f} "
+                f"{mark + format(statistics.mean(tokens), '.0f'):>11} "
+                f"{mark + str(p95):>12} {mark + str(total):>10} "
+                f"{1 - total / base:>9.1%}"
+            )
+    if not exact:
+        print("\n≈ tiktoken не установлен — токены оценены приблизительно")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--teachers", type=int, default=50)
+    parser.add_argument("--encoding", default="cl100k_base")
+    args = parser.parse_args()
+
+    count_tokens, exact = token_counter(args.encoding)
+    payloads = await load_payloads(args.teachers)
+    if not payloads["group_week"]:
+        print("В базе нет расписаний — сначала загрузите .docx")
+        return
+    report(measure(payloads, count_tokens), exact)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+Общие фикстуры тестов.
+
+MongoDB подменяется in-memory mongomock_motor до импорта модулей
+приложения: они берут db из app.database при импорте.
+
+    pip install -r requirements-dev.txt && python -m pytest
+"""
+
+import asyncio
+import functools
+import mongomock_motor
+import pytest
+from mongomock.collection import BulkOperationBuilder
+import app.database
+
+client = mongomock_motor.AsyncMongoMockClient()
+app.database.client = client
+app.database.db = client["college_schedule_bot"]
+
+
+def _drop_sort(method):
+    # pymongo >= 4.11 передаёт в bulk-операции sort, mongomock его не знает
+    @functools.wraps(method)
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+BulkOperationBuilder.add_update = _drop_sort(BulkOperationBuilder.add_update)
+BulkOperationBuilder.add_replace = _drop_sort(BulkOperationBuilder.add_replace)
+
+
+def run(coro):
+    """Выполняет корутину теста (pytest-asyncio не используется)"""
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Пустая база на каждый тест (и кэши, привязанные к её поколению)"""
+    from app.services import bell_times
+    from app.services.schedule_cache import schedule_cache
+
+    schedule_cache.generation = None
+    schedule_cache.clear()
+    monkeypatch.setattr(bell_times, "_loaded_generation", None)
+    yield app.database.db
+    run(client.drop_database("college_schedule_bot"))
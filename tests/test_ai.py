@@ -0,0 +1,86 @@
+"""AI-эндпоинты: без ключа OpenRouter — 503; ключи кэша прогрева и запросов."""
+
+import asyncio
+from collections import Counter
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import ai_service, ai_warmup
+from app.services.schedule_cache import bump_schedule_generation
+from app.services.schedule_service import ScheduleService
+from app.services.schedule_store import sync_schedules
+from app.services.teacher_index import rebuild_teacher_index
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+def test_ai_unavailable_without_key(client, monkeypatch):
+    monkeypatch.setattr(ai_service, "OPENROUTER_API_KEY", None)
+    monkeypatch.setattr(ai_warmup, "AI_WARMUP_ENABLED", True)
+
+    for response in (
+        client.get("/ai/schedule/ИС-11"),
+        client.get("/ai/teacher/Иванов/stream"),
+        client.post("/ai/", json={"user_message": "?", "system_message": "!"}),
+        client.post("/ai/warmup"),
+    ):
+        assert response.status_code == 503
+
+    assert ai_warmup.start_warmup("upload") is None
+    assert client.get("/ai/warmup").json()["enabled"] is False
+    # не-AI эндпоинты ключ не требуют
+    assert client.get("/ai/cache/stats").status_code == 200
+    assert client.get("/schedule/ИС-11").status_code == 404
+
+
+def test_ai_key_set(client, monkeypatch):
+    monkeypatch.setattr(ai_service, "OPENROUTER_API_KEY", "test")
+    # ключ есть — дальше обычная проверка группы
+    assert client.get("/ai/schedule/ИС-11").status_code == 404
+
+
+async def _seed_teacher():
+    schedule = {
+        "zero_lesson": {},
+        "days": {
+            "Понедельник": {
+                "1": {"subject": "Математика", "teacher": "Иванов И.И."},
+            }
+        },
+    }
+    await sync_schedules(
+        [{"group_name": "ИС-11", "schedule": schedule, "shift_info": {"shift": 1}}]
+    )
+    await rebuild_teacher_index()
+    await bump_schedule_generation()
+
+
+def test_teacher_warmup_key_matches_request(db, monkeypatch):
+    monkeypatch.setattr(ai_service, "OPENROUTER_API_KEY", "test")
+    monkeypatch.setattr(ai_warmup, "_teacher_requests", Counter())
+
+    async def scenario():
+        await _seed_teacher()
+        service = ai_service.AIService()
+        job = ai_warmup.WarmupJob("test")
+        warm = {}
+        for target in await job._targets():
+            if target[0] == "teacher":
+                warm[target[3]] = job._request(target, await job._schedule(target))[0]
+        assert list(warm) == ["Понедельник"]
+
+        # клиент пишет как угодно — ключ тот же, что у прогрева
+        for fio in ("Иванов", "иванов и. и.", "Иванов И.И."):
+            schedule = await ScheduleService.get_teacher_schedule(fio, "пн")
+            keys = await ScheduleService.resolve_teacher_keys(fio)
+            assert keys == ["ивановии"]
+            ai_warmup.note_teacher_request(keys)
+            request = service._teacher_request(schedule, fio, "пн", teacher_keys=keys)
+            assert request[0] == warm["Понедельник"]
+        # запросы учитываются по ключу индекса — его и прогревают первым
+        assert ai_warmup._teacher_requests == {"ивановии": 3}
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""Звонки накладываются при чтении: условные GET расписания группы после загрузки."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.schedule_cache import bump_schedule_generation
+from app.services.schedule_store import sync_schedules
+
+GROUP = "ИС-11"
+BELLS = {"понедельник": {"1_shift": {"1": "08:30–09:50"}}}
+
+
+async def _seed(db):
+    schedule = {
+        "zero_lesson": {},
+        "days": {"Понедельник": {"1": {"subject": "Математика"}}},
+    }
+    await sync_schedules(
+        [{"group_name": GROUP, "schedule": schedule, "shift_info": {"shift": 1}}]
+    )
+    # группа давно не менялась: Last-Modified должен сдвинуть только звонки
+    await db.schedules.update_one(
+        {"group_name": GROUP},
+        {"$set": {"updated_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}},
+    )
+    await bump_schedule_generation()
+
+
+def _lesson_time(response) -> str | None:
+    return response.json()["schedule"]["days"]["Понедельник"]["1"].get("time")
+
+
+def test_bell_upload_invalidates_conditional_get(db):
+    asyncio.run(_seed(db))
+    client = TestClient(app)
+
+    first = client.get(f"/schedule/{GROUP}")
+    assert first.status_code == 200
+    assert _lesson_time(first) is None
+    last_modified = first.headers["Last-Modified"]
+    assert parsedate_to_datetime(last_modified).year == 2020
+    assert (
+        client.get(
+            f"/schedule/{GROUP}", headers={"If-Modified-Since": last_modified}
+        ).status_code
+        == 304
+    )
+
+    upload = client.post(
+        "/bell_schedule/upload",
+        files={"file": ("bells.json", json.dumps(BELLS), "application/json")},
+    )
+    assert upload.status_code == 200
+
+    for headers in (
+        {"If-Modified-Since": last_modified},
+        {"If-None-Match": first.headers["ETag"]},
+    ):
+        response = client.get(f"/schedule/{GROUP}", headers=headers)
+        assert response.status_code == 200
+        assert _lesson_time(response) == "08:30–09:50"
+        assert parsedate_to_datetime(response.headers["Last-Modified"]).year > 2020
+
+    # то же для ответа за один день
+    day = client.get(
+        f"/schedule/{GROUP}",
+        params={"day": "пн"},
+        headers={"If-Modified-Since": last_modified},
+    )
+    assert day.status_code == 200
+    assert _lesson_time(day) == "08:30–09:50"
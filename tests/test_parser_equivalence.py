@@ -0,0 +1,81 @@
+"""
+Потоковый движок "xml" против эталонного python-docx ("docx") на
+синтетических DOCX из benchmarks.docx_generator.
+"""
+
+import asyncio
+import pytest
+from app.services import schedule_parser
+from app.services.schedule_parser import (
+    parse_schedule_from_docx,
+    parse_stats_delta,
+    parse_stats_snapshot,
+)
+from benchmarks.docx_generator import generate_schedule_docx
+
+GROUPS = 24
+
+# каждый вариант доводит до предела один особый случай генератора
+CASES = {
+    "default": {},
+    # пары объединены по вертикали (vMerge) на обе половинки
+    "vmerge": {"merged": 1.0, "empty": 0.1},
+    # дни с подгруппами: заголовки и общие пары объединены по gridSpan
+    "gridspan": {"subgroup_days": 1.0, "empty": 0.1},
+    # строки начинаются и кончаются раньше сетки (gridBefore / gridAfter)
+    "grid_offsets": {"grid_offsets": 1.0, "subgroup_days": 0.5},
+    "zero_lessons": {"zero_lessons": 1.0, "half_pairs": 0.5},
+}
+
+
+@pytest.fixture(scope="module", params=sorted(CASES))
+def docx_path(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp("docx") / f"{request.param}.docx"
+    generate_schedule_docx(str(path), GROUPS, seed=7, **CASES[request.param])
+    return str(path)
+
+
+def _parse(path: str, engine: str):
+    # кэш разбора ячеек общий на процесс — движки сравниваются с холодного
+    schedule_parser._parse_lesson_cell.cache_clear()
+    return parse_schedule_from_docx(path, engine)
+
+
+def test_xml_matches_reference(docx_path):
+    expected = _parse(docx_path, "docx")
+    actual = _parse(docx_path, "xml")
+    assert len(expected) == GROUPS
+    assert actual == expected
+
+
+def test_merged_cells_parsed_once(tmp_path):
+    path = str(tmp_path / "merged.docx")
+    generate_schedule_docx(path, 4, seed=3, merged=1.0, subgroup_days=1.0, empty=0.0)
+    before = parse_stats_snapshot()
+    actual = _parse(path, "xml")
+    stats = parse_stats_delta(before)
+    # объединённая ячейка разбирается один раз, остальные колонки — повтор
+    assert stats["merged_cells"] > 0
+    assert actual == _parse(path, "docx")
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        parse_schedule_from_docx("missing.docx", "pdf")
+
+
+@pytest.mark.parametrize("shard_min_bytes", [0, 1 << 40])
+def test_pool_matches_inline(tmp_path, monkeypatch, shard_min_bytes):
+    path = str(tmp_path / "pool.docx")
+    generate_schedule_docx(path, 9, seed=5)
+    monkeypatch.setattr(schedule_parser, "PARSER_WORKERS", 2)
+    monkeypatch.setattr(schedule_parser, "PARSER_SHARD_MIN_BYTES", shard_min_bytes)
+    try:
+        schedules, stats = asyncio.run(
+            schedule_parser.parse_schedule_async(path, "xml")
+        )
+    finally:
+        schedule_parser.shutdown_parser_pool()
+    assert list(schedules) == list(_parse(path, "xml"))
+    assert schedules == _parse(path, "xml")
+    assert stats["hits"] + stats["misses"] > 0
@@ -0,0 +1,45 @@
+"""Формат compact: поля занятия стоят на позициях легенды."""
+
+from app.services.prompt_encoding import (
+    GROUP_LESSON_LEGEND,
+    encode_group_schedule,
+    encode_schedule,
+)
+
+
+def test_empty_fields_keep_positions():
+    schedule = {
+        "group_name": "ИС-11",
+        "schedule": {
+            "zero_lesson": {"Понедельник": {"subject": None}},
+            "days": {
+                "Понедельник": {
+                    "1": {
+                        "subject": "Математика",
+                        "teacher": "Иванов И.И.",
+                        "classroom": "101",
+                        "time": "08:30-10:00",
+                    },
+                    "2": {"subject": "Физика", "classroom": "204"},
+                    "3": {"subject": "История", "time": "12:00-13:20"},
+                    "4": {},
+                }
+            },
+        },
+    }
+    assert encode_group_schedule(schedule).splitlines() == [
+        "Группа: ИС-11",
+        f"Строка занятия: {GROUP_LESSON_LEGEND}",
+        "Понедельник:",
+        "1. Математика; Иванов И.И.; ауд. 101; 08:30-10:00",
+        "2. Физика; —; ауд. 204",
+        "3. История; —; —; 12:00-13:20",
+    ]
+
+
+def test_version_selects_encoding():
+    schedule = {"group_name": "ИС-11", "schedule": {}}
+    assert encode_schedule(schedule, "group", "3").startswith("Группа: ИС-11")
+    assert encode_schedule(schedule, "group", "1").startswith("{")
+    # снятая версия 2 (и любая неизвестная) — исходный json
+    assert encode_schedule(schedule, "group", "2").startswith("{")
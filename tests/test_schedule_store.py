@@ -0,0 +1,123 @@
+"""Запись расписаний: инкрементальная синхронизация, подмена коллекции, откат."""
+
+import asyncio
+import pytest
+from app.services import schedule_store
+from app.services.schedule_format import from_storage
+from app.services.schedule_store import (
+    PREVIOUS_COLLECTION,
+    SCHEDULES_COLLECTION,
+    rollback_schedules,
+    sync_schedules,
+)
+
+
+def _schedule(subject: str) -> dict:
+    return {
+        "zero_lesson": {},
+        "days": {"Понедельник": {"1": {"subject": subject, "teacher": None}}},
+    }
+
+
+def _docs(**subjects) -> list[dict]:
+    return [
+        {
+            "group_name": group,
+            "schedule": _schedule(subject),
+            "shift_info": {"shift": 1},
+        }
+        for group, subject in subjects.items()
+    ]
+
+
+async def _subjects(db, collection: str) -> dict:
+    return {
+        doc["group_name"]: from_storage(doc["schedule"])["days"]["Понедельник"]["1"][
+            "subject"
+        ]
+        async for doc in db[collection].find()
+    }
+
+
+def test_sync_writes_only_changes(db, monkeypatch):
+    # подмена коллекции целиком — только начиная с половины групп
+    monkeypatch.setattr(schedule_store, "FULL_SWAP_RATIO", 0.5)
+
+    async def scenario():
+        groups = {f"Г-{i}": "Математика" for i in range(10)}
+        stats = await sync_schedules(_docs(**groups))
+        assert (stats["added"], stats["changed"], stats["removed"]) == (10, 0, 0)
+        assert len(stats["inserted_ids"]) == 10
+        first = {d["group_name"]: d async for d in db[SCHEDULES_COLLECTION].find()}
+
+        stats = await sync_schedules(_docs(**groups))
+        assert stats["unchanged"] == 10 and stats["inserted_ids"] == []
+
+        groups["Г-1"] = "Физика"
+        del groups["Г-2"]
+        groups["Г-new"] = "История"
+        stats = await sync_schedules(_docs(**groups))
+        assert stats["added"] == 1
+        assert stats["changed"] == 1
+        assert stats["removed"] == 1
+        assert stats["unchanged"] == 8
+        assert len(stats["inserted_ids"]) == 1
+
+        live = {d["group_name"]: d async for d in db[SCHEDULES_COLLECTION].find()}
+        assert await _subjects(db, SCHEDULES_COLLECTION) == groups
+        # неизменённые группы не переписывались
+        assert live["Г-3"]["updated_at"] == first["Г-3"]["updated_at"]
+        assert live["Г-3"]["_id"] == first["Г-3"]["_id"]
+        # прошлая версия — ровно то, что было до загрузки
+        previous = await _subjects(db, PREVIOUS_COLLECTION)
+        assert previous == {f"Г-{i}": "Математика" for i in range(10)}
+
+    asyncio.run(scenario())
+
+
+def test_full_swap_and_rollback(db):
+    async def scenario():
+        assert not await rollback_schedules()
+        await sync_schedules(_docs(А="Математика", Б="Физика"))
+        await sync_schedules(_docs(А="История", В="Химия"))
+        assert await _subjects(db, SCHEDULES_COLLECTION) == {
+            "А": "История",
+            "В": "Химия",
+        }
+
+        assert await rollback_schedules()
+        assert await _subjects(db, SCHEDULES_COLLECTION) == {
+            "А": "Математика",
+            "Б": "Физика",
+        }
+        # повторный откат возвращает новую версию
+        assert await rollback_schedules()
+        assert await _subjects(db, SCHEDULES_COLLECTION) == {
+            "А": "История",
+            "В": "Химия",
+        }
+        names = await db.list_collection_names()
+        assert schedule_store.STAGING_COLLECTION not in names
+        assert schedule_store.ROLLBACK_TMP_COLLECTION not in names
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("ratio", [0.0, 1.1])
+def test_previous_matches_live_before_upload(db, monkeypatch, ratio):
+    # 0.0 — всегда подмена коллекции, 1.1 — всегда точечная запись
+    monkeypatch.setattr(schedule_store, "FULL_SWAP_RATIO", ratio)
+
+    async def scenario():
+        versions = [
+            {"А": "1", "Б": "1"},
+            {"А": "2", "Б": "1", "В": "1"},
+            {"А": "2", "В": "3"},
+        ]
+        for before, after in zip(versions, versions[1:]):
+            await sync_schedules(_docs(**before))
+            await sync_schedules(_docs(**after))
+            assert await _subjects(db, PREVIOUS_COLLECTION) == before
+            assert await _subjects(db, SCHEDULES_COLLECTION) == after
+
+    asyncio.run(scenario())
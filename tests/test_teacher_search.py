@@ -0,0 +1,34 @@
+"""Поиск преподавателей: разрешение введённого ФИО в ключи индекса."""
+
+from app.services.teacher_index import teacher_key
+from app.services.teacher_search import TeacherSearchIndex
+from app.utils.common import normalize_name
+
+NAMES = ["Иванов И.И.", "Иванова А.Б.", "Петров П.П.", "Сидоров-Кузнецов В.Г."]
+
+
+def _index() -> TeacherSearchIndex:
+    return TeacherSearchIndex(
+        [{"key": teacher_key(n), "name": n, "lessons": 1} for n in NAMES]
+    )
+
+
+def _resolve(fio: str) -> list[str]:
+    return sorted(_index().resolve(normalize_name(fio)))
+
+
+def test_resolve_exact_prefix_and_longer_input():
+    assert _resolve("Иванов И.И.") == ["ивановии"]
+    # начало фамилии — все подходящие преподаватели
+    assert _resolve("Иванов") == ["ивановааб", "ивановии"]
+    assert _resolve("сидоров-кузнецов") == ["сидоров-кузнецоввг"]
+    # ввод длиннее ключа
+    assert _resolve("Петров П.П. каб. 201") == ["петровпп"]
+    assert _resolve("Смирнов") == []
+    assert _resolve("") == []
+
+
+def test_search_ranks_exact_first():
+    candidates = _index().search("иванов и и")
+    assert candidates[0]["key"] == "ивановии"
+    assert candidates[0]["score"] == 1.0
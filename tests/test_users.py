@@ -0,0 +1,205 @@
+"""Пользователи: keyset-пагинация, счётчики user_stats, потоковый разбор тела bulk."""
+
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException, Response
+from app.routers.users import create_user, delete_user, update_user
+from app.models.user import User
+from app.services.user_import import iter_json_records
+from app.services import user_stats
+from app.services.user_stats import (
+    USER_STATS_COLLECTION,
+    get_platform_stats,
+    reconcile_user_stats,
+)
+from app.utils.pagination import NEXT_CURSOR_HEADER, fetch_page
+
+
+def _user(user_id: int, **fields) -> User:
+    return User(
+        **{
+            "user_id": user_id,
+            "platform": "telegram",
+            "role": "student",
+            "group_name": "ИС-11",
+            **fields,
+        }
+    )
+
+
+def test_cursor_pagination(db):
+    async def scenario():
+        await db.users.insert_many([{"user_id": i} for i in range(25)])
+        seen = []
+        cursor = None
+        while True:
+            response = Response()
+            page = await fetch_page(db.users, {}, 10, cursor, response)
+            seen.extend(doc["user_id"] for doc in page)
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            if cursor is None:
+                break
+        assert seen == list(range(25))
+
+        with pytest.raises(HTTPException):
+            await fetch_page(db.users, {}, 10, "not-a-cursor", Response())
+
+    asyncio.run(scenario())
+
+
+def test_stats_follow_user_changes(db):
+    async def scenario():
+        await create_user(_user(1, schedule_enabled=True))
+        await create_user(_user(2, role="teacher", group_name=None))
+        await create_user(_user(3, group_name="ПК-21"))
+        await update_user("telegram", 3, {"group_name": "ИС-11"})
+        await update_user("telegram", 2, {"schedule_enabled": True})
+        await delete_user("telegram", 1)
+
+        stats = await get_platform_stats("telegram")
+        assert stats == {
+            "total": 2,
+            "students": 1,
+            "teachers": 1,
+            "admins": 0,
+            "subscriptions": 1,
+            "groups": 1,
+        }
+        # поддерживаемые счётчики совпадают с пересчётом с нуля
+        assert await reconcile_user_stats() == {}
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_fixes_drift(db):
+    async def scenario():
+        await create_user(_user(1))
+        await create_user(_user(2, group_name="ПК-21"))
+        await db[USER_STATS_COLLECTION].update_one(
+            {"_id": "telegram"}, {"$inc": {"total": 5, "groups.Старая": 2}}
+        )
+
+        drift = await reconcile_user_stats()
+        assert set(drift["telegram"]) == {"total", "groups.Старая"}
+        assert (await get_platform_stats("telegram"))["total"] == 2
+        assert await reconcile_user_stats() == {}
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_does_not_double_count_concurrent_change(db, monkeypatch):
+    compute = user_stats._compute_stats
+    correct = user_stats._correct
+    writes = []
+    pending = [_user(10, group_name="")]
+
+    async def compute_during_write(platform):
+        # пользователь уже записан в users (и попадёт в пересчёт),
+        # а его $inc счётчиков придёт только после поправки
+        if pending:
+            user = pending.pop()
+            change = user_stats.user_changes(["telegram"])
+            incs = await change.__aenter__()
+            await db.users.insert_one(user.dict())
+            user_stats.add_user_change(incs, None, user.dict())
+            writes.append(change)
+        return await compute(platform)
+
+    async def correct_then_finish_write(*args):
+        applied = await correct(*args)
+        while writes:
+            await writes.pop().__aexit__(None, None, None)
+        return applied
+
+    async def scenario():
+        await create_user(_user(1))
+        await db[USER_STATS_COLLECTION].update_one(
+            {"_id": "telegram"}, {"$inc": {"total": 3}}
+        )
+        monkeypatch.setattr(user_stats, "_compute_stats", compute_during_write)
+        monkeypatch.setattr(user_stats, "_correct", correct_then_finish_write)
+        drift = await reconcile_user_stats()
+        # первая поправка отклонена (seq сменился), вторая видит оба изменения
+        assert drift["telegram"]["total"] == {"stored": 5, "actual": 2}
+        monkeypatch.setattr(user_stats, "_compute_stats", compute)
+        monkeypatch.setattr(user_stats, "_correct", correct)
+
+        assert await reconcile_user_stats() == {}
+        stats = await get_platform_stats("telegram")
+        assert stats["total"] == 2
+        # пустое имя группы считается группой, как в прежней агрегации
+        assert stats["groups"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_skips_platform_with_pending_write(db):
+    async def scenario():
+        await create_user(_user(1))
+        await db[USER_STATS_COLLECTION].update_one(
+            {"_id": "telegram"}, {"$inc": {"total": 3, "pending": 1}}
+        )
+        assert await reconcile_user_stats(attempts=2) == {}
+        assert (await get_platform_stats("telegram"))["total"] == 4
+
+        await db[USER_STATS_COLLECTION].update_one(
+            {"_id": "telegram"}, {"$inc": {"pending": -1, "seq": 1}}
+        )
+        assert "total" in (await reconcile_user_stats())["telegram"]
+        assert (await get_platform_stats("telegram"))["total"] == 1
+
+    asyncio.run(scenario())
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False)
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def _records(data: bytes, size: int) -> list:
+    return [record async for record in iter_json_records(_chunks(data, size))]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 4096])
+def test_json_records_any_chunking(size):
+    records = [{"user_id": i, "group_name": 'ИС-11 \\u "x"'} for i in range(20)]
+    array = ("[" + ", ".join(map(_dumps, records)) + "]").encode()
+    ndjson = "\n".join(map(_dumps, records)).encode()
+    assert asyncio.run(_records(array, size)) == records
+    assert asyncio.run(_records(ndjson, size)) == records
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b'[{"user_id": 1}, {"user_id": 2',  # оборван посреди записи
+        b'[{"user_id": 1}, {"user_id": "abc}]',  # незакрытая строка
+        b'{"user_id": 1}\n{"user_id": 2} trailing',
+    ],
+)
+def test_json_records_truncated(data):
+    with pytest.raises(ValueError):
+        asyncio.run(_records(data, 5))
+
+
+def test_json_records_error_before_end():
+    # ошибка в начале длинного потока — до чтения остальных чанков
+    read = []
+
+    async def chunks():
+        yield b'[{"user_id": 1}, {"user_id": }'
+        for i in range(1000):
+            read.append(i)
+            yield b', {"user_id": 2}' * 10
+
+    async def consume():
+        return [record async for record in iter_json_records(chunks())]
+
+    with pytest.raises(ValueError):
+        asyncio.run(consume())
+    assert len(read) < 5